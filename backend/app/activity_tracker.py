@@ -2,60 +2,71 @@
 Activity tracking helper for challenges and achievements system
 """
 
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 
+# user_stats only summarizes crop_care_log, so refreshes are buffered per user
+# and written in one transaction at most every STATS_FLUSH_INTERVAL seconds.
+STATS_FLUSH_INTERVAL = 2.0
+
+_pending_stats: dict = {}
+_STATS_LOCK = threading.Lock()
+_stats_timer: Optional[threading.Timer] = None
+
+# An upsert rather than INSERT OR REPLACE, which would reset the total_*
+# counters that farm actions maintain in the same row
+_REFRESH_STATS_SQL = """
+    INSERT INTO user_stats 
+    (user_id, plants_count, waters_count, fertilizes_count, harvests_count, last_activity)
+    SELECT ?,
+           COALESCE(SUM(action_type = 'plant'), 0),
+           COALESCE(SUM(action_type = 'water'), 0),
+           COALESCE(SUM(action_type = 'fertilize'), 0),
+           COALESCE(SUM(action_type = 'harvest'), 0),
+           ?
+    FROM crop_care_log WHERE user_id = ?
+    ON CONFLICT(user_id) DO UPDATE SET
+        plants_count = excluded.plants_count,
+        waters_count = excluded.waters_count,
+        fertilizes_count = excluded.fertilizes_count,
+        harvests_count = excluded.harvests_count,
+        last_activity = excluded.last_activity
+"""
+
 def log_activity(user_id: int, action_type: str, xp_earned: int = 0, 
-                coins_earned: int = 0, db_connection=None, **kwargs):
+                coins_earned: int = 0, db_connection=None, check_achievements: bool = True,
+                **kwargs):
     """
     Log a user activity and check for achievements/challenges
     
+    The calling endpoints write the crop_care_log row themselves; the user_stats
+    refresh is queued for the next flush_activity_stats().
+    
     Args:
         user_id: User ID performing the action
         action_type: Type of action ('plant', 'water', 'fertilize', 'harvest')
         xp_earned: XP earned from this action
         coins_earned: Coins earned from this action
         db_connection: Database connection to use
+        check_achievements: Check achievements now; pass False while db_connection
+            holds an open write transaction, since the check writes on its own
+            connection, and call check_achievements_for_user after committing
         **kwargs: Additional parameters like quality_level, efficiency_score, etc.
     """
+    global _stats_timer
     try:
-        if db_connection is None:
-            from .database import get_db_connection
-            db_connection = get_db_connection()
-            should_close = True
-        else:
-            should_close = False
-        
-        cursor = db_connection.cursor()
-        
-        # Extract additional parameters
-        quality_level = kwargs.get('quality_level', 'good')
-        cost_paid = kwargs.get('cost_paid', 0)
-        efficiency_score = kwargs.get('efficiency_score', 80.0)
-        crop_id = kwargs.get('crop_id')
-        
-        # Log the activity (this is already done by the calling endpoints)
-        # We just need to update user stats and check achievements
-        
-        # Update user_stats table for quick access
-        cursor.execute("""
-            INSERT OR REPLACE INTO user_stats 
-            (user_id, plants_count, waters_count, fertilizes_count, harvests_count, last_activity)
-            VALUES (
-                ?,
-                COALESCE((SELECT COUNT(*) FROM crop_care_log WHERE user_id = ? AND action_type = 'plant'), 0),
-                COALESCE((SELECT COUNT(*) FROM crop_care_log WHERE user_id = ? AND action_type = 'water'), 0),
-                COALESCE((SELECT COUNT(*) FROM crop_care_log WHERE user_id = ? AND action_type = 'fertilize'), 0),
-                COALESCE((SELECT COUNT(*) FROM crop_care_log WHERE user_id = ? AND action_type = 'harvest'), 0),
-                CURRENT_TIMESTAMP
-            )
-        """, (user_id, user_id, user_id, user_id, user_id))
+        # Same UTC format SQLite's CURRENT_TIMESTAMP produces
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with _STATS_LOCK:
+            _pending_stats[user_id] = now
+            if _stats_timer is None:
+                _stats_timer = threading.Timer(STATS_FLUSH_INTERVAL, flush_activity_stats)
+                _stats_timer.daemon = True
+                _stats_timer.start()
         
         # Check for new achievements
-        newly_unlocked = check_achievements_for_user(user_id, db_connection)
-        
-        if should_close:
-            db_connection.close()
+        newly_unlocked = check_achievements_for_user(user_id, db_connection) if check_achievements else []
         
         return {
             "success": True,
@@ -66,14 +77,32 @@ def log_activity(user_id: int, action_type: str, xp_earned: int = 0,
         
     except Exception as e:
         print(f"Error in log_activity: {e}")
-        if should_close and db_connection:
-            db_connection.close()
         return {
             "success": False,
             "error": str(e),
             "newly_unlocked_achievements": []
         }
 
+
+def flush_activity_stats():
+    """Refresh user_stats for every buffered user in a single transaction."""
+    global _stats_timer
+    with _STATS_LOCK:
+        if _stats_timer is not None:
+            _stats_timer.cancel()
+            _stats_timer = None
+        if not _pending_stats:
+            return
+        refreshes = [(user_id, stamp, user_id) for user_id, stamp in _pending_stats.items()]
+        _pending_stats.clear()
+    
+    from .database import write_connection
+    try:
+        with write_connection() as conn, conn:
+            conn.executemany(_REFRESH_STATS_SQL, refreshes)
+    except Exception as e:
+        print(f"Error refreshing user stats: {e}")
+
 def check_achievements_for_user(user_id: int, db_connection) -> List[Dict[str, Any]]:
     """Check and unlock any new achievements for user"""
     try:
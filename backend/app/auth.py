@@ -1,18 +1,26 @@
 """Authentication logic with JWT tokens."""
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from passlib.context import CryptContext
+import bcrypt
 from jose import JWTError, jwt
 
 from .config import get_settings
 from .database import UserDB
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Hashes made at a lower cost are rewritten at BCRYPT_COST
+# on the user's next successful login; stronger ones are kept as they are.
+BCRYPT_COST = get_settings().bcrypt_cost
+
+# bcrypt is pure CPU and releases the GIL, so hashes run here in parallel
+# instead of stalling the event loop for every signup/login
+HASH_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
 
 # JWT token security
 security = HTTPBearer()
@@ -25,12 +33,42 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        # Not a bcrypt hash
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_COST)).decode()
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; on success, rehash it if it was stored at a lower cost."""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    # Modular crypt format: $2b$<cost>$<salt+checksum>
+    if int(hashed_password.split("$")[2]) < BCRYPT_COST:
+        return True, get_password_hash(plain_password)
+    return True, None
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify on HASH_EXECUTOR; also return a replacement hash if the stored one is outdated."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        HASH_EXECUTOR, _verify_and_update, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() on HASH_EXECUTOR."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_EXECUTOR, get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -59,8 +97,8 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    """Get current user from JWT token."""
+def _user_id_from_credentials(credentials: HTTPAuthorizationCredentials) -> int:
+    """Extract the user id from a bearer token."""
     token = credentials.credentials
     payload = decode_token(token)
     
@@ -70,8 +108,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+    return int(user_id)
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Get current user from JWT token."""
+    user_id = _user_id_from_credentials(credentials)
     
-    user = UserDB.get_user_by_id(int(user_id))
+    user = UserDB.get_user_by_id(user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -85,20 +129,42 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     return user
 
 
-def authenticate_user(username_or_email: str, password: str) -> Optional[dict]:
-    """Authenticate a user and return user data if valid."""
-    identifier = username_or_email.strip().lower()
-    # Try email first (case-insensitive)
-    user = UserDB.get_user_by_email(identifier)
+async def get_current_auth_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Get the authenticated user's id and language from JWT token.
+
+    For endpoints that only need to know who is calling; it checks the user
+    with a narrow query instead of loading the full profile.
+    """
+    user_id = _user_id_from_credentials(credentials)
+    
+    auth_user = UserDB.get_auth_user(user_id)
+    if auth_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+    
+    return {"id": auth_user.id, "language": auth_user.language}
+
+
+async def authenticate_user(username_or_email: str, password: str) -> Optional[dict]:
+    """Authenticate a user and return user data if valid.
+
+    ``username_or_email`` is expected lowercased, as UserLogin delivers it.
+    """
+    # Try email first, then username
+    user = UserDB.get_user_by_email(username_or_email)
     if not user:
-        # Try username (case-insensitive)
-        user = UserDB.get_user_by_username(identifier)
+        user = UserDB.get_user_by_username(username_or_email)
     
     if not user:
         return None
     
-    if not verify_password(password, user["password_hash"]):
+    verified, new_hash = await verify_and_update_password_async(password, user["password_hash"])
+    if not verified:
         return None
+    if new_hash:
+        await asyncio.to_thread(UserDB.update_password_hash, user["id"], new_hash)
     
     # Update last login
     UserDB.update_last_login(user["id"])
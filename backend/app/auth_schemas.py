@@ -1,7 +1,9 @@
 """Pydantic schemas for authentication."""
 
-from typing import Optional
-from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from .avatar_service import avatar_service
 
 
 class UserSignup(BaseModel):
@@ -12,12 +14,32 @@ class UserSignup(BaseModel):
     full_name: Optional[str] = None
     language: str = Field(default="en", pattern="^(en|hi|es|pt)$")
 
+    @field_validator("email", "username")
+    @classmethod
+    def normalize_identity(cls, value: str) -> str:
+        """Lowercase email/username once so lookups can compare directly."""
+        return value.strip().lower()
+
+    @field_validator("password")
+    @classmethod
+    def fits_bcrypt(cls, value: str) -> str:
+        """Reject passwords bcrypt would truncate before any hashing work is done."""
+        if len(value.encode("utf-8")) > 72:
+            raise ValueError("Password must be at most 72 bytes")
+        return value
+
 
 class UserLogin(BaseModel):
     """Schema for user login."""
     username_or_email: str
     password: str
 
+    @field_validator("username_or_email")
+    @classmethod
+    def normalize_identifier(cls, value: str) -> str:
+        """Lowercase the identifier to match the stored email/username."""
+        return value.strip().lower()
+
 
 class UserResponse(BaseModel):
     """Schema for user response (without password)."""
@@ -29,10 +51,34 @@ class UserResponse(BaseModel):
     coins: int = 0
     xp: int = 0
     welcome_bonus_claimed: bool = False
-    created_at: str
-    last_login: Optional[str]
+    created_at: Optional[str] = None
+    last_login: Optional[str] = None
     avatar_url: Optional[str] = None
 
+    @field_validator("coins", "xp", mode="before")
+    @classmethod
+    def default_counters(cls, value: Any) -> Any:
+        """Treat NULL counters from older rows as zero."""
+        return value or 0
+
+    @field_validator("welcome_bonus_claimed", mode="before")
+    @classmethod
+    def coerce_flag(cls, value: Any) -> bool:
+        """Accept the 0/1/NULL integer flag stored in SQLite."""
+        return bool(value)
+
+    @field_validator("created_at", "last_login", mode="before")
+    @classmethod
+    def stringify_timestamp(cls, value: Any) -> Optional[str]:
+        """Render stored timestamps as strings, keeping empty values as None."""
+        return str(value) if value else None
+
+    @field_validator("avatar_url")
+    @classmethod
+    def normalize_avatar(cls, value: Optional[str]) -> Optional[str]:
+        """Serve DiceBear avatars as PNG for React Native."""
+        return avatar_service.normalize_avatar_url(value)
+
 
 class TokenResponse(BaseModel):
     """Schema for token response."""
@@ -1,12 +1,28 @@
 """Avatar generation and management service using free APIs."""
 
 import requests
+from functools import lru_cache
 from typing import Optional
 import hashlib
 import urllib.parse
 from .database import get_db_session
 
 
+@lru_cache(maxsize=4096)
+def _normalize_avatar_url(url: str) -> str:
+    """Normalize one avatar URL; users' URLs repeat on every request, so cache them."""
+    if 'api.dicebear.com' in url:
+        # Convert path /svg to /png
+        if '/svg' in url:
+            url = url.replace('/svg', '/png')
+        # Remove potential format=svg param if present
+        url = url.replace('format=svg', 'format=png')
+        # If backgroundColor has multiple comma-separated values encoded, keep first color only
+        # This is optional – DiceBear supports it, but we keep it simple.
+        # No strict parsing here; existing URLs will continue to work.
+    return url
+
+
 class AvatarService:
     """Service for generating and managing user avatars using free APIs."""
     
@@ -109,19 +125,7 @@ class AvatarService:
         """
         if not url:
             return url
-        try:
-            if 'api.dicebear.com' in url:
-                # Convert path /svg to /png
-                if '/svg' in url:
-                    url = url.replace('/svg', '/png')
-                # Remove potential format=svg param if present
-                url = url.replace('format=svg', 'format=png')
-                # If backgroundColor has multiple comma-separated values encoded, keep first color only
-                # This is optional – DiceBear supports it, but we keep it simple.
-                # No strict parsing here; existing URLs will continue to work.
-            return url
-        except Exception:
-            return url
+        return _normalize_avatar_url(url)
 
     def _update_if_normalized(self, user_id: int, avatar_url: Optional[str]) -> Optional[str]:
         """Normalize avatar URL and persist changes if modified."""
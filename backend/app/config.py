@@ -30,6 +30,12 @@ class Settings(BaseSettings):
         default="gemma2:2b",
         description="Ollama model tag to use (e.g. gemma2:2b, gemma3:1b)",
     )
+    bcrypt_cost: int = Field(
+        default=10,
+        ge=4,
+        le=31,
+        description="bcrypt work factor; each step doubles the CPU spent per login/signup",
+    )
 
     class Config:
         env_prefix = "FASALSEVA_"
@@ -1,33 +1,199 @@
 """Database setup and models for user authentication."""
 
+import json
+import os
 import sqlite3
-from datetime import datetime
+import threading
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-DATABASE_PATH = Path(__file__).parent.parent / "fasal_seva.db"
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+DATABASE_PATH = os.getenv("FASALSEVA_DATABASE_PATH") or Path(__file__).parent.parent / "fasal_seva.db"
+
+# ":memory:" (e.g. for throwaway test runs) becomes a named shared-cache
+# in-memory database so every connection in the process sees the same data.
+# The anchor connection keeps it alive for the life of the process.
+_DATABASE_URI = DATABASE_PATH == ":memory:"
+if _DATABASE_URI:
+    DATABASE_PATH = "file:fasal_seva?mode=memory&cache=shared"
+    _memory_anchor = sqlite3.connect(DATABASE_PATH, uri=True, check_same_thread=False)
+
+# Compiled statements are cached per connection; keep enough slots for every
+# hot query in the app so long-lived connections never recompile them.
+STATEMENT_CACHE_SIZE = 256
+
+# Bump whenever init_db() gains a table, column or index so existing databases
+# rerun it once; matching databases skip the CREATE/ALTER pass entirely.
+SCHEMA_VERSION = 10
+
+# INSERT ... RETURNING landed in SQLite 3.35; older builds use lastrowid.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Safety net for writers outside the UserDB write lock (other modules).
+BUSY_TIMEOUT_MS = 30000
+
+# Per-connection settings applied on open (journal_mode=WAL is persistent and
+# set once by ensure_db()). NORMAL sync is durable under WAL except across an
+# OS crash; cache_size/mmap_size are ceilings, not up-front allocations.
+CONNECTION_PRAGMAS = (
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",  # 64 MB
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+)
+
+_thread_local = threading.local()
+_WRITE_LOCK = threading.Lock()
+_writer_conn: Optional[sqlite3.Connection] = None
+
+# last_login does not need sub-second accuracy, so logins are buffered and
+# written in one transaction at most every LAST_LOGIN_FLUSH_INTERVAL seconds.
+LAST_LOGIN_FLUSH_INTERVAL = 2.0
+
+_pending_logins: dict = {}
+_PENDING_LOCK = threading.Lock()
+_flush_timer: Optional[threading.Timer] = None
+_INITIALIZED = False
+_INIT_LOCK = threading.Lock()
+
+
+def _connect(check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a new connection with the shared settings."""
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+        uri=_DATABASE_URI,
+    )
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _writer_connection() -> sqlite3.Connection:
+    """Return the process-wide connection for writes.
+
+    Callers must hold _WRITE_LOCK. Funnelling writes through one connection
+    means they queue in-process instead of contending for SQLite's write lock
+    and backing off on SQLITE_BUSY; readers keep their own connections and,
+    under WAL, run alongside the writer.
+    """
+    global _writer_conn
+    if _writer_conn is None:
+        _writer_conn = _connect(check_same_thread=False)
+    return _writer_conn
+
+
+def pack_json(value: Any) -> sqlite3.Binary:
+    """Serialize ``value`` as zlib-compressed JSON for the large blob columns.
+
+    Compressed payloads keep nasa_data and educational_content rows small
+    enough to stay off SQLite overflow pages.
+    """
+    if orjson is not None:
+        raw = orjson.dumps(value)
+    else:
+        raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return sqlite3.Binary(zlib.compress(raw))
+
+
+def unpack_json(data: Any, default: Any = None) -> Any:
+    """Inverse of pack_json; also accepts plain JSON text from older rows."""
+    if data is None:
+        return default
+    if isinstance(data, (bytes, memoryview)):
+        data = zlib.decompress(data)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_fragment(data: Any, default: Any = None) -> Any:
+    """Return a pack_json() value ready to embed in an orjson-rendered response.
+
+    With orjson.Fragment the stored JSON bytes are passed through verbatim
+    instead of being decoded here and re-encoded by the response; without it
+    this is just unpack_json().
+    """
+    if data is None:
+        return default
+    if orjson is None or not hasattr(orjson, "Fragment"):
+        return unpack_json(data, default)
+    if isinstance(data, (bytes, memoryview)):
+        data = zlib.decompress(data)
+    return orjson.Fragment(data)
+
+
+def _user_connection() -> sqlite3.Connection:
+    """Return this thread's long-lived connection for UserDB queries.
+
+    Reusing the connection lets SQLite serve repeat lookups from its
+    prepared-statement cache instead of re-parsing them on every request.
+    """
+    conn = getattr(_thread_local, "user_conn", None)
+    if conn is None:
+        conn = _connect()
+        # Plain tuples; readers map them with _user_row() instead of
+        # paying for a sqlite3.Row plus dict(row) per lookup.
+        conn.row_factory = None
+        _thread_local.user_conn = conn
+    return conn
 
 
 class DatabaseSession:
-    """Simple database session wrapper for SQLite."""
+    """Simple database session wrapper for SQLite.
+
+    Usable as a context manager: commits on success, rolls back on error and
+    always closes the connection.
+    """
     def __init__(self):
-        self.conn = sqlite3.connect(DATABASE_PATH)
-        self.conn.row_factory = sqlite3.Row  # Enable row access by column name
+        self.conn = _connect()
+        self._last_cursor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
     
     def execute(self, query, params=None):
         """Execute a query with parameters."""
         cursor = self.conn.cursor()
         if params:
-            return cursor.execute(query, params)
-        return cursor.execute(query)
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        self._last_cursor = cursor
+        return cursor
     
     def fetchone(self):
-        """Fetch one result."""
-        return self.conn.cursor().fetchone()
+        """Fetch one result from the last executed query."""
+        if self._last_cursor is None:
+            return None
+        return self._last_cursor.fetchone()
     
     def fetchall(self):
-        """Fetch all results."""
-        return self.conn.cursor().fetchall()
+        """Fetch all results from the last executed query."""
+        if self._last_cursor is None:
+            return []
+        return self._last_cursor.fetchall()
     
     def commit(self):
         """Commit changes."""
@@ -39,6 +205,7 @@ class DatabaseSession:
     
     def close(self):
         """Close connection."""
+        self._last_cursor = None
         self.conn.close()
 
 
@@ -47,264 +214,414 @@ def get_db_session():
     return DatabaseSession()
 
 
-def init_db():
-    """Initialize the SQLite database with users table."""
-    conn = sqlite3.connect(DATABASE_PATH)
+# Columns added after the first release, by table. Databases created before
+# they existed get them through ALTER TABLE in _migrate_legacy_columns().
+LEGACY_COLUMNS = {
+    "users": {
+        "coins": "INTEGER DEFAULT 0",
+        "welcome_bonus_claimed": "INTEGER DEFAULT 0",
+        "xp": "INTEGER DEFAULT 0",
+        "level": "INTEGER DEFAULT 1",
+        "total_xp": "INTEGER DEFAULT 0",
+        "avatar_url": "TEXT",
+    },
+    "crops": {
+        "latitude": "REAL DEFAULT NULL",
+        "longitude": "REAL DEFAULT NULL",
+        "climate_bonus": "REAL DEFAULT 0",
+        "planted_at_epoch": "INTEGER",
+        "total_investment": "INTEGER DEFAULT 0",
+        "care_score": "REAL DEFAULT 60.0",
+        "last_watered": "TIMESTAMP",
+        "last_fertilized": "TIMESTAMP",
+        "last_reward_calculated": "TIMESTAMP",
+    },
+    "user_stats": {
+        "current_streak": "INTEGER DEFAULT 0",
+        "last_activity": "TIMESTAMP",
+        "plants_count": "INTEGER DEFAULT 0",
+        "waters_count": "INTEGER DEFAULT 0",
+        "fertilizes_count": "INTEGER DEFAULT 0",
+        "harvests_count": "INTEGER DEFAULT 0",
+    },
+    "crop_care_log": {
+        "quality_level": "TEXT",
+        "cost_paid": "INTEGER DEFAULT 0",
+        "efficiency_score": "REAL",
+        # ALTER TABLE cannot add a CURRENT_TIMESTAMP default; writers set it.
+        "created_at": "TIMESTAMP",
+    },
+    "educational_content": {
+        # Rows written before this column existed read as stale and regenerate.
+        "generated_at_epoch": "INTEGER",
+    },
+}
+
+
+def _migrate_legacy_columns(conn: sqlite3.Connection):
+    """Add any missing LEGACY_COLUMNS in a single transaction.
+
+    Already-migrated databases only pay one PRAGMA per table; no DDL runs.
+    """
     cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT,
-            language TEXT DEFAULT 'en',
-            coins INTEGER DEFAULT 0,
-            welcome_bonus_claimed INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
-    """)
-    
-    # Create user_farms table for storing farm data
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_farms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            farm_name TEXT,
-            latitude REAL NOT NULL,
-            longitude REAL NOT NULL,
-            crop_type TEXT,
-            farm_size TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
+    missing = []
+    for table, columns in LEGACY_COLUMNS.items():
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        missing.extend(
+            (table, name, definition)
+            for name, definition in columns.items()
+            if name not in existing
         )
-    """)
-    
-    # Create farm_state table for game state
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS farm_state (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            farm_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            crops_json TEXT DEFAULT '[]',
-            xp INTEGER DEFAULT 0,
-            level INTEGER DEFAULT 1,
-            coins INTEGER DEFAULT 0,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (farm_id) REFERENCES user_farms (id),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(farm_id)
-        )
-    """)
-
-    # Ensure new user columns exist for legacy databases
-    cursor.execute("PRAGMA table_info(users)")
-    user_columns = {row[1] for row in cursor.fetchall()}
-    if "coins" not in user_columns:
-        cursor.execute("ALTER TABLE users ADD COLUMN coins INTEGER DEFAULT 0")
-    if "welcome_bonus_claimed" not in user_columns:
-        cursor.execute("ALTER TABLE users ADD COLUMN welcome_bonus_claimed INTEGER DEFAULT 0")
-    if "level" not in user_columns:
-        cursor.execute("ALTER TABLE users ADD COLUMN level INTEGER DEFAULT 1")
-    if "total_xp" not in user_columns:
-        cursor.execute("ALTER TABLE users ADD COLUMN total_xp INTEGER DEFAULT 0")
-    
-    # Create user_challenges table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_challenges (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            challenge_id TEXT NOT NULL,
-            progress INTEGER DEFAULT 0,
-            completed BOOLEAN DEFAULT 0,
-            completed_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, challenge_id)
-        )
-    """)
-    
-    # Create user_achievements table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_achievements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            achievement_id TEXT NOT NULL,
-            unlocked_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, achievement_id)
-        )
-    """)
-    
-    # Create user_stats table for leaderboard
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_stats (
-            user_id INTEGER PRIMARY KEY,
-            plants_count INTEGER DEFAULT 0,
-            waters_count INTEGER DEFAULT 0,
-            fertilizes_count INTEGER DEFAULT 0,
-            harvests_count INTEGER DEFAULT 0,
-            current_streak INTEGER DEFAULT 0,
-            last_activity TIMESTAMP,
-            total_plants INTEGER DEFAULT 0,
-            total_waters INTEGER DEFAULT 0,
-            total_fertilizes INTEGER DEFAULT 0,
-            total_harvests INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-
-    # Create crop_care_log table for activity tracking (needed for challenges)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS crop_care_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            crop_id INTEGER,
-            action_type TEXT NOT NULL,  -- 'plant', 'water', 'fertilize', 'harvest'
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            details TEXT,  -- JSON string for additional action details
-            xp_earned INTEGER DEFAULT 0,
-            coins_earned INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (crop_id) REFERENCES crops (id)
-        )
-    """)
-    
-    # Create crops table for interactive farm management
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS crops (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            position_row INTEGER NOT NULL,
-            position_col INTEGER NOT NULL,
-            planted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            growth_stage REAL DEFAULT 0,
-            water_level REAL DEFAULT 100,
-            health REAL DEFAULT 100,
-            fertilizer_level REAL DEFAULT 100,
-            latitude REAL DEFAULT NULL,
-            longitude REAL DEFAULT NULL,
-            climate_bonus REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, position_row, position_col)
-        )
-    """)
-    
-    # Add location columns to existing crops table if they don't exist
-    try:
-        cursor.execute("ALTER TABLE crops ADD COLUMN latitude REAL DEFAULT NULL")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute("ALTER TABLE crops ADD COLUMN longitude REAL DEFAULT NULL")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
-    try:
-        cursor.execute("ALTER TABLE crops ADD COLUMN climate_bonus REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    # Add missing columns to user_stats for achievements system
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN current_streak INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN last_activity TIMESTAMP")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN plants_count INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN waters_count INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
-    try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN fertilizes_count INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-        
+
+    if not missing:
+        return
+
+    cursor.execute("BEGIN IMMEDIATE")
     try:
-        cursor.execute("ALTER TABLE user_stats ADD COLUMN harvests_count INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    # Create plant_scenarios table for active scenarios
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS plant_scenarios (
-            id TEXT PRIMARY KEY,
-            crop_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            scenario_type TEXT NOT NULL,
-            severity TEXT NOT NULL,
-            description TEXT NOT NULL,
-            impact_description TEXT NOT NULL,
-            nasa_data_trigger TEXT,  -- JSON string
-            available_actions TEXT NOT NULL,  -- JSON string
-            auto_resolve_time INTEGER,  -- hours until auto-resolve
-            active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TIMESTAMP,
-            resolution_action TEXT,
-            FOREIGN KEY (crop_id) REFERENCES crops (id),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    
-    # Create user_progress table for level system
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_progress (
-            user_id INTEGER PRIMARY KEY,
-            level INTEGER DEFAULT 1,
-            xp INTEGER DEFAULT 0,
-            coins INTEGER DEFAULT 100,  -- Start with some coins
-            total_scenarios_completed INTEGER DEFAULT 0,
-            successful_harvests INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-    
-    # Create shop_items table for purchasable items
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS shop_items (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            cost_coins INTEGER NOT NULL,
-            category TEXT NOT NULL,
-            effects TEXT,  -- JSON string
-            available BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        for table, name, definition in missing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Every table init_db() creates. All statements are idempotent and run as one
+# executescript batch.
+_SCHEMA_SQL = """
+-- users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE NOT NULL,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    full_name TEXT,
+    language TEXT DEFAULT 'en',
+    coins INTEGER DEFAULT 0,
+    welcome_bonus_claimed INTEGER DEFAULT 0,
+    xp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    total_xp INTEGER DEFAULT 0,
+    avatar_url TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_login TIMESTAMP
+);
+
+-- Emails and usernames are stored lowercased and lookups compare them
+-- directly, so the UNIQUE indexes serve logins; the older LOWER(...)
+-- expression indexes are no longer used.
+DROP INDEX IF EXISTS idx_users_email_lower;
+DROP INDEX IF EXISTS idx_users_username_lower;
+
+-- user_farms table for storing farm data
+CREATE TABLE IF NOT EXISTS user_farms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    farm_name TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    crop_type TEXT,
+    farm_size TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- farm_state table for game state
+CREATE TABLE IF NOT EXISTS farm_state (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    farm_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    crops_json TEXT DEFAULT '[]',
+    xp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    coins INTEGER DEFAULT 0,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (farm_id) REFERENCES user_farms (id),
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(farm_id)
+);
+
+-- Per-user best xp/level across farms, kept by the farm endpoints so the
+-- leaderboard reads an index instead of aggregating farm_state
+CREATE TABLE IF NOT EXISTS user_ranking (
+    user_id INTEGER PRIMARY KEY,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+INSERT OR IGNORE INTO user_ranking (user_id, xp, level)
+SELECT user_id, MAX(xp), MAX(level) FROM farm_state GROUP BY user_id;
+
+-- Per-user care aggregates over crops, kept by triggers on crops so the care
+-- leaderboard reads an index instead of grouping every crop
+CREATE TABLE IF NOT EXISTS user_care_summary (
+    user_id INTEGER PRIMARY KEY,
+    avg_care_score REAL,
+    total_crops INTEGER NOT NULL DEFAULT 0,
+    total_invested INTEGER,
+    best_score REAL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- user_challenges table
+CREATE TABLE IF NOT EXISTS user_challenges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    challenge_id TEXT NOT NULL,
+    progress INTEGER DEFAULT 0,
+    completed BOOLEAN DEFAULT 0,
+    completed_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(user_id, challenge_id)
+);
+
+-- user_achievements table
+CREATE TABLE IF NOT EXISTS user_achievements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    achievement_id TEXT NOT NULL,
+    unlocked_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(user_id, achievement_id)
+);
+
+-- user_stats table for leaderboard
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    plants_count INTEGER DEFAULT 0,
+    waters_count INTEGER DEFAULT 0,
+    fertilizes_count INTEGER DEFAULT 0,
+    harvests_count INTEGER DEFAULT 0,
+    current_streak INTEGER DEFAULT 0,
+    last_activity TIMESTAMP,
+    total_plants INTEGER DEFAULT 0,
+    total_waters INTEGER DEFAULT 0,
+    total_fertilizes INTEGER DEFAULT 0,
+    total_harvests INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- crop_care_log table for activity tracking (needed for challenges)
+CREATE TABLE IF NOT EXISTS crop_care_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    crop_id INTEGER,
+    action_type TEXT NOT NULL,  -- 'plant', 'water', 'fertilize', 'harvest'
+    quality_level TEXT,
+    cost_paid INTEGER DEFAULT 0,
+    efficiency_score REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    details TEXT,  -- JSON string for additional action details
+    xp_earned INTEGER DEFAULT 0,
+    coins_earned INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (crop_id) REFERENCES crops (id)
+);
+
+-- crops table for interactive farm management
+CREATE TABLE IF NOT EXISTS crops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    position_row INTEGER NOT NULL,
+    position_col INTEGER NOT NULL,
+    planted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    growth_stage REAL DEFAULT 0,
+    water_level REAL DEFAULT 100,
+    health REAL DEFAULT 100,
+    fertilizer_level REAL DEFAULT 100,
+    latitude REAL DEFAULT NULL,
+    longitude REAL DEFAULT NULL,
+    climate_bonus REAL DEFAULT 0,
+    planted_at_epoch INTEGER,  -- planted_at as unix seconds, for the growth math
+    total_investment INTEGER DEFAULT 0,
+    care_score REAL DEFAULT 60.0,
+    last_watered TIMESTAMP,
+    last_fertilized TIMESTAMP,
+    last_reward_calculated TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(user_id, position_row, position_col)
+);
+
+-- plant_scenarios table for active scenarios
+CREATE TABLE IF NOT EXISTS plant_scenarios (
+    id TEXT PRIMARY KEY,
+    crop_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    scenario_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    description TEXT NOT NULL,
+    impact_description TEXT NOT NULL,
+    nasa_data_trigger TEXT,  -- JSON string
+    available_actions TEXT NOT NULL,  -- JSON string
+    auto_resolve_time INTEGER,  -- hours until auto-resolve
+    active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    resolved_at TIMESTAMP,
+    resolution_action TEXT,
+    FOREIGN KEY (crop_id) REFERENCES crops (id),
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- user_progress table for level system
+CREATE TABLE IF NOT EXISTS user_progress (
+    user_id INTEGER PRIMARY KEY,
+    level INTEGER DEFAULT 1,
+    xp INTEGER DEFAULT 0,
+    coins INTEGER DEFAULT 100,  -- Start with some coins
+    total_scenarios_completed INTEGER DEFAULT 0,
+    successful_harvests INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- shop_items table for purchasable items
+CREATE TABLE IF NOT EXISTS shop_items (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    cost_coins INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    effects TEXT,  -- JSON string
+    available BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- user_purchases table for purchased items
+CREATE TABLE IF NOT EXISTS user_purchases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    quantity INTEGER DEFAULT 1,
+    purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (item_id) REFERENCES shop_items (id)
+);
+
+-- nasa_data table for caching NASA API responses
+CREATE TABLE IF NOT EXISTS nasa_data (
+    crop_id INTEGER PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    temperature BLOB,  -- pack_json() of temperature data
+    precipitation BLOB,  -- pack_json() of precipitation data
+    solar_radiation BLOB,  -- pack_json() of solar radiation data
+    humidity BLOB,  -- pack_json() of humidity data
+    wind_speed BLOB,  -- pack_json() of wind speed data
+    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (crop_id) REFERENCES crops (id)
+);
+
+-- educational_content table for caching AI-generated content
+CREATE TABLE IF NOT EXISTS educational_content (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,  -- Hash of user's plants/location for change detection
+    facts_json BLOB NOT NULL,    -- pack_json() of facts
+    missions_json BLOB NOT NULL, -- pack_json() of interactive missions
+    insights_json BLOB NOT NULL, -- pack_json() of climate insights
+    tips_json BLOB NOT NULL,     -- pack_json() of sustainability tips
+    location_lat REAL NOT NULL,
+    location_lon REAL NOT NULL,
+    plant_count INTEGER NOT NULL,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    generated_at_epoch INTEGER,  -- Unix seconds of generated_at, for staleness checks
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(user_id)  -- One educational content record per user
+);
+
+-- educational_progress table to track completed content
+CREATE TABLE IF NOT EXISTS educational_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    content_type TEXT NOT NULL,  -- 'fact', 'mission', 'tip'
+    content_id TEXT NOT NULL,    -- ID from the educational content
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    xp_earned INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    UNIQUE(user_id, content_type, content_id)
+);
+"""
+
+# Recompute user_care_summary rows from crops for the given user ids
+_CARE_SUMMARY_REFRESH_SQL = """
+INSERT OR REPLACE INTO user_care_summary
+    (user_id, avg_care_score, total_crops, total_invested, best_score)
+SELECT user_id, AVG(care_score), COUNT(id), SUM(total_investment), MAX(care_score)
+FROM crops {} GROUP BY user_id"""
+
+# Indexes and triggers that depend on columns added by
+# _migrate_legacy_columns(), so they are created after it runs.
+_INDEX_SQL = """
+-- Per-user lookups on the tables that grow with every action
+CREATE INDEX IF NOT EXISTS idx_crop_care_log_user ON crop_care_log(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_purchases_user ON user_purchases(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_achievements_user ON user_achievements(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_challenges_user ON user_challenges(user_id);
+CREATE INDEX IF NOT EXISTS idx_plant_scenarios_user ON plant_scenarios(user_id);
+-- crops(user_id) lookups use the UNIQUE(user_id, position_row, position_col) index
+DROP INDEX IF EXISTS idx_crops_user;
+
+-- Activity feed / streak queries read a user's care log newest first
+CREATE INDEX IF NOT EXISTS idx_care_user_time ON crop_care_log(user_id, created_at DESC);
+
+-- "Latest first" reads: the user's newest farm and completed lessons
+CREATE INDEX IF NOT EXISTS idx_user_farms_user_created ON user_farms(user_id, created_at DESC);
+DROP INDEX IF EXISTS idx_user_farms_user;
+CREATE INDEX IF NOT EXISTS idx_edu_progress_user_time ON educational_progress(user_id, completed_at DESC);
+
+-- Leaderboard top-K and rank lookups
+CREATE INDEX IF NOT EXISTS idx_user_ranking_xp ON user_ranking(xp DESC, level DESC);
+CREATE INDEX IF NOT EXISTS idx_user_care_summary_score
+    ON user_care_summary(avg_care_score DESC, best_score DESC);
+
+-- Keep user_care_summary in step with crops; the per-user refresh reads the
+-- crops UNIQUE(user_id, ...) index, and updates that leave care_score and
+-- total_investment alone (growth, decay) do not fire
+CREATE TRIGGER IF NOT EXISTS crops_care_summary_ai AFTER INSERT ON crops BEGIN
+""" + _CARE_SUMMARY_REFRESH_SQL.format("WHERE user_id = NEW.user_id") + """;
+END;
+CREATE TRIGGER IF NOT EXISTS crops_care_summary_au
+AFTER UPDATE OF user_id, care_score, total_investment ON crops BEGIN
+    DELETE FROM user_care_summary WHERE user_id IN (OLD.user_id, NEW.user_id);
+""" + _CARE_SUMMARY_REFRESH_SQL.format("WHERE user_id IN (OLD.user_id, NEW.user_id)") + """;
+END;
+CREATE TRIGGER IF NOT EXISTS crops_care_summary_ad AFTER DELETE ON crops BEGIN
+    DELETE FROM user_care_summary WHERE user_id = OLD.user_id;
+""" + _CARE_SUMMARY_REFRESH_SQL.format("WHERE user_id = OLD.user_id") + """;
+END;
+"""
+
+
+def init_db():
+    """Initialize the SQLite database with users table."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=_DATABASE_URI)
+    cursor = conn.cursor()
     
-    # Create user_purchases table for purchased items
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_purchases (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            item_id TEXT NOT NULL,
-            quantity INTEGER DEFAULT 1,
-            purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (item_id) REFERENCES shop_items (id)
+    conn.executescript("BEGIN;" + _SCHEMA_SQL + "COMMIT;")
+
+    # Bring legacy databases up to the current column set
+    _migrate_legacy_columns(conn)
+
+    conn.executescript("BEGIN;" + _INDEX_SQL + "COMMIT;")
+
+    # planted_at is stored as local time; fill the epoch for crops planted
+    # before the column existed
+    with conn:
+        cursor.execute(
+            "UPDATE crops SET planted_at_epoch = CAST(strftime('%s', planted_at, 'utc') AS INTEGER) "
+            "WHERE planted_at_epoch IS NULL"
         )
-    """)
-    
+
+    # Rebuild the care summary; the crops triggers keep it current from here on
+    with conn:
+        cursor.execute("DELETE FROM user_care_summary")
+        cursor.execute(_CARE_SUMMARY_REFRESH_SQL.format(""))
+
     # Insert default shop items
     cursor.execute("SELECT COUNT(*) FROM shop_items")
     if cursor.fetchone()[0] == 0:
@@ -316,63 +633,14 @@ def init_db():
             ("solar_panels", "Solar Farm Panels", "Generate passive income", 500, "upgrades", '{"passive_income": 20}'),
             ("greenhouse", "Mini Greenhouse", "Protects crops from severe weather", 800, "upgrades", '{"weather_protection": 0.5}'),
         ]
-        
-        for item in default_items:
-            cursor.execute("""
+
+        with conn:
+            cursor.executemany("""
                 INSERT OR IGNORE INTO shop_items (id, name, description, cost_coins, category, effects)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, item)
-
-    # Create nasa_data table for caching NASA API responses
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS nasa_data (
-            crop_id INTEGER PRIMARY KEY,
-            latitude REAL NOT NULL,
-            longitude REAL NOT NULL,
-            temperature TEXT,  -- JSON string of temperature data
-            precipitation TEXT,  -- JSON string of precipitation data
-            solar_radiation TEXT,  -- JSON string of solar radiation data
-            humidity TEXT,  -- JSON string of humidity data
-            wind_speed TEXT,  -- JSON string of wind speed data
-            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (crop_id) REFERENCES crops (id)
-        )
-    """)
-
-    # Create educational_content table for caching AI-generated content
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS educational_content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            content_hash TEXT NOT NULL,  -- Hash of user's plants/location for change detection
-            facts_json TEXT NOT NULL,    -- JSON string of facts
-            missions_json TEXT NOT NULL, -- JSON string of interactive missions
-            insights_json TEXT NOT NULL, -- JSON string of climate insights
-            tips_json TEXT NOT NULL,     -- JSON string of sustainability tips
-            location_lat REAL NOT NULL,
-            location_lon REAL NOT NULL,
-            plant_count INTEGER NOT NULL,
-            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id)  -- One educational content record per user
-        )
-    """)
-
-    # Create educational_progress table to track completed content
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS educational_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            content_type TEXT NOT NULL,  -- 'fact', 'mission', 'tip'
-            content_id TEXT NOT NULL,    -- ID from the educational content
-            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            xp_earned INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, content_type, content_id)
-        )
-    """)
-    
+            """, default_items)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
     conn.close()
     try:
@@ -382,11 +650,157 @@ def init_db():
         print("Database initialized.")
 
 
+def ensure_db():
+    """Create or migrate the schema once per process.
+
+    Skips init_db() when the file's PRAGMA user_version already matches
+    SCHEMA_VERSION, so restarts against an up-to-date database stay cheap.
+    """
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+    with _INIT_LOCK:
+        if _INITIALIZED:
+            return
+        conn = sqlite3.connect(DATABASE_PATH, uri=_DATABASE_URI)
+        try:
+            # WAL lets readers run while a write is in progress
+            conn.execute("PRAGMA journal_mode = WAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+        if version != SCHEMA_VERSION:
+            init_db()
+        _INITIALIZED = True
+
+
+# Columns returned by the UserDB readers; listed explicitly so lookups never
+# pull in columns added later that the auth path does not use.
+_USER_KEYS = (
+    "id", "email", "username", "password_hash", "full_name", "language", "coins",
+    "welcome_bonus_claimed", "xp", "level", "total_xp", "avatar_url", "created_at", "last_login",
+)
+_USER_COLS = ", ".join(_USER_KEYS)
+
+# Hot-path statements, built once so each call hands the connection's
+# statement cache the same string instead of formatting a new one
+_USER_BY_EMAIL_SQL = f"SELECT {_USER_COLS} FROM users WHERE email = ?"
+_USER_BY_USERNAME_SQL = f"SELECT {_USER_COLS} FROM users WHERE username = ?"
+_USER_BY_ID_SQL = f"SELECT {_USER_COLS} FROM users WHERE id = ?"
+_CREATE_USER_SQL = """INSERT INTO users (email, username, password_hash, full_name, language)
+                      VALUES (?, ?, ?, ?, ?)"""
+_CREATE_USER_RETURNING_SQL = (
+    _CREATE_USER_SQL + f" ON CONFLICT DO NOTHING RETURNING {_USER_COLS}"
+)
+_GRANT_BONUS_SQL = """UPDATE users SET coins = COALESCE(coins, 0) + 1000, welcome_bonus_claimed = 1
+                      WHERE id = ? AND NOT COALESCE(welcome_bonus_claimed, 0)"""
+_GRANT_BONUS_RETURNING_SQL = _GRANT_BONUS_SQL + " RETURNING coins"
+
+
+# Minimal view of a user for per-request token checks
+AuthUser = namedtuple("AuthUser", ["id", "password_hash", "language"])
+
+
+def _user_row(row: Optional[tuple]) -> Optional[dict]:
+    """Build a user dict from a plain tuple row selected with _USER_COLS."""
+    return dict(zip(_USER_KEYS, row)) if row else None
+
+
+_catalog_conn: Optional[sqlite3.Connection] = None
+_CATALOG_LOCK = threading.Lock()
+
+
+def reload_catalog():
+    """Rebuild the in-memory mirror of shop_items from the main database.
+
+    Call after changing shop_items so catalog reads pick up the new rows.
+    """
+    global _catalog_conn
+    conn = sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("ATTACH DATABASE ? AS disk", (str(DATABASE_PATH),))
+    conn.execute("CREATE TABLE shop_items AS SELECT * FROM disk.shop_items")
+    conn.execute("DETACH DATABASE disk")
+    with _CATALOG_LOCK:
+        old, _catalog_conn = _catalog_conn, conn
+    if old is not None:
+        old.close()
+
+
+def query_catalog(query: str, params: tuple = ()) -> list:
+    """Run a read-only query against the in-memory shop_items mirror.
+
+    The catalog is read on every shop visit but practically never changes,
+    so serving it from memory keeps those reads off the disk database.
+    """
+    if _catalog_conn is None:
+        reload_catalog()
+    with _CATALOG_LOCK:
+        return _catalog_conn.execute(query, params).fetchall()
+
+
+# Idle connections kept by db_pool; bursts beyond this open temporary extras.
+POOL_SIZE = 8
+
+
+class ConnectionPool:
+    """Small pool of long-lived SQLite connections.
+
+    SQLite's page cache belongs to a connection and is thrown away on close,
+    so reusing a few connections keeps hot pages warm between requests.
+    acquire() never blocks: when no idle connection is available it opens an
+    extra one, which is closed on release if the pool is already full.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._idle: list = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection; uncommitted work is rolled back on return."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = _connect(check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+
+db_pool = ConnectionPool()
+
+
+@contextmanager
+def write_connection():
+    """Borrow the process-wide writer connection; uncommitted work is rolled back on return.
+
+    Writers queue on _WRITE_LOCK, a thread lock that worker threads and the
+    buffered flushes also hold, so coroutines reach this through
+    asyncio.to_thread: taken on the event loop, it stalls every request while
+    another writer is busy.
+    """
+    with _WRITE_LOCK:
+        conn = _writer_connection()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+
 def get_db_connection():
     """Get a database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+    return _connect()
 
 
 class UserDB:
@@ -394,65 +808,142 @@ class UserDB:
     
     @staticmethod
     def create_user(email: str, username: str, password_hash: str, 
-                   full_name: Optional[str] = None, language: str = "en") -> Optional[int]:
-        """Create a new user and return user_id."""
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT INTO users (email, username, password_hash, full_name, language) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (email.lower(), username.lower(), password_hash, full_name, language)
+                   full_name: Optional[str] = None, language: str = "en") -> Optional[dict]:
+        """Create a new user and return the stored row, or None on a duplicate.
+
+        ``email`` and ``username`` must already be lowercased (the auth
+        schemas normalize them). The UNIQUE constraints decide duplicates, so
+        callers need no existence check first; see taken_identity().
+        """
+        params = (email, username, password_hash, full_name, language)
+        with _WRITE_LOCK:
+            conn = _writer_connection()
+            if HAS_RETURNING:
+                with conn:
+                    row = conn.execute(_CREATE_USER_RETURNING_SQL, params).fetchone()
+                return _user_row(row)
+            try:
+                with conn:
+                    user_id = conn.execute(_CREATE_USER_SQL, params).lastrowid
+            except sqlite3.IntegrityError:
+                return None  # User already exists
+            return _user_row(conn.execute(_USER_BY_ID_SQL, (user_id,)).fetchone())
+    
+    @staticmethod
+    def taken_identity(email: str) -> str:
+        """After a failed create_user(), report whether "email" or "username" clashed."""
+        taken = _user_connection().execute(
+            "SELECT 1 FROM users WHERE email = ?", (email,)
+        ).fetchone()
+        return "email" if taken else "username"
+    
+    @staticmethod
+    def update_password_hash(user_id: int, password_hash: str):
+        """Replace a user's password hash, e.g. after a bcrypt cost change."""
+        with _WRITE_LOCK:
+            conn = _writer_connection()
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id)
             )
-            user_id = cursor.lastrowid
             conn.commit()
-            conn.close()
-            return user_id
-        except sqlite3.IntegrityError:
-            return None  # User already exists
+    
+    @staticmethod
+    def grant_welcome_bonus(user_id: int) -> Optional[int]:
+        """Credit the one-time 1000 coin welcome bonus and return the new balance.
+
+        Returns None if the bonus was already claimed.
+        """
+        with _WRITE_LOCK:
+            conn = _writer_connection()
+            with conn:
+                if HAS_RETURNING:
+                    row = conn.execute(_GRANT_BONUS_RETURNING_SQL, (user_id,)).fetchone()
+                elif conn.execute(_GRANT_BONUS_SQL, (user_id,)).rowcount:
+                    row = conn.execute("SELECT coins FROM users WHERE id = ?", (user_id,)).fetchone()
+                else:
+                    row = None
+                if row is None:
+                    return None
+                # Create user_progress record for game statistics (no coins)
+                conn.execute(
+                    """INSERT OR IGNORE INTO user_progress
+                       (user_id, level, total_scenarios_completed, successful_harvests)
+                       VALUES (?, 1, 0, 0)""",
+                    (user_id,)
+                )
+            return row[0]
+    
+    @staticmethod
+    def update_language(user_id: int, language: str):
+        """Set a user's preferred language."""
+        with _WRITE_LOCK:
+            conn = _writer_connection()
+            conn.execute("UPDATE users SET language = ? WHERE id = ?", (language, user_id))
+            conn.commit()
     
     @staticmethod
     def get_user_by_email(email: str) -> Optional[dict]:
-        """Get user by email."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE LOWER(email) = ?", (email.lower(),))
-        user = cursor.fetchone()
-        conn.close()
-        return dict(user) if user else None
+        """Get user by lowercased email."""
+        user = _user_connection().execute(
+            _USER_BY_EMAIL_SQL, (email,)
+        ).fetchone()
+        return _user_row(user)
     
     @staticmethod
     def get_user_by_username(username: str) -> Optional[dict]:
-        """Get user by username."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE LOWER(username) = ?", (username.lower(),))
-        user = cursor.fetchone()
-        conn.close()
-        return dict(user) if user else None
+        """Get user by lowercased username."""
+        user = _user_connection().execute(
+            _USER_BY_USERNAME_SQL, (username,)
+        ).fetchone()
+        return _user_row(user)
     
     @staticmethod
     def update_last_login(user_id: int):
-        """Update user's last login timestamp."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET last_login = ? WHERE id = ?",
-            (datetime.now(), user_id)
-        )
-        conn.commit()
-        conn.close()
+        """Record user's last login timestamp; written by the next flush."""
+        global _flush_timer
+        # Same UTC format SQLite's CURRENT_TIMESTAMP produces
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with _PENDING_LOCK:
+            _pending_logins[user_id] = now
+            if _flush_timer is None:
+                _flush_timer = threading.Timer(LAST_LOGIN_FLUSH_INTERVAL, UserDB.flush_last_logins)
+                _flush_timer.daemon = True
+                _flush_timer.start()
+    
+    @staticmethod
+    def flush_last_logins():
+        """Write all buffered last_login timestamps in a single transaction."""
+        global _flush_timer
+        with _PENDING_LOCK:
+            if _flush_timer is not None:
+                _flush_timer.cancel()
+                _flush_timer = None
+            if not _pending_logins:
+                return
+            updates = [(stamp, user_id) for user_id, stamp in _pending_logins.items()]
+            _pending_logins.clear()
+        
+        with _WRITE_LOCK:
+            conn = _writer_connection()
+            conn.executemany("UPDATE users SET last_login = ? WHERE id = ?", updates)
+            conn.commit()
     
     @staticmethod
     def get_user_by_id(user_id: int) -> Optional[dict]:
         """Get user by ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-        return dict(user) if user else None
+        user = _user_connection().execute(
+            _USER_BY_ID_SQL, (user_id,)
+        ).fetchone()
+        return _user_row(user)
+    
+    @staticmethod
+    def get_auth_user(user_id: int) -> Optional[AuthUser]:
+        """Get the fields needed to authenticate a request for a user ID."""
+        row = _user_connection().execute(
+            "SELECT id, password_hash, language FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        return AuthUser._make(row) if row else None
 
 
-# Initialize database on module import
-init_db()
+if __name__ == "__main__":
+    ensure_db()
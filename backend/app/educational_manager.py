@@ -1,75 +1,101 @@
 """Smart educational content manager with caching and auto-updates."""
 
-import json
+import asyncio
 import hashlib
+from bisect import bisect_right
 import sqlite3
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 import logging
 
+from cachetools import TTLCache
+
 from .ai import AIAdvisor
-from .database import get_db_connection
+from .database import db_pool, json_fragment, pack_json, write_connection
 
 logger = logging.getLogger(__name__)
 
+# Tier cut-offs for content personalization, ascending; bisect picks the tier
+HEALTH_TIER_THRESHOLDS = (40, 60, 80)
+HEALTH_TIERS = ("poor", "fair", "good", "excellent")
+LEVEL_TIER_THRESHOLDS = (40, 70)
+LEVEL_TIERS = ("low", "medium", "high")
+
+# Recently served content keyed by (user_id, content_hash) as
+# (generated_at_epoch, content); a hit skips the database read and payload
+# decoding while the user's farm state is unchanged.
+_content_cache: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+
+# Completion writes are queued and committed together by a background task:
+# up to PROGRESS_BATCH_SIZE rows or PROGRESS_BATCH_WINDOW seconds per commit.
+PROGRESS_BATCH_SIZE = 64
+PROGRESS_BATCH_WINDOW = 0.05
+
+# Background content saves; holding the tasks keeps them from being collected
+# mid-flight and lets shutdown wait for them.
+_pending_saves: set = set()
+
+# Kept as one constant so every save hits the same statement cache entry
+_SAVE_CONTENT_SQL = """
+    INSERT OR REPLACE INTO educational_content 
+    (user_id, content_hash, facts_json, missions_json, insights_json, tips_json,
+     location_lat, location_lon, plant_count, generated_at, generated_at_epoch,
+     last_updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 
 class EducationalContentManager:
     """Manages educational content generation, caching, and automatic updates."""
     
     def __init__(self):
         self.advisor = AIAdvisor()
+        self._progress_queue: Optional[asyncio.Queue] = None
+        self._progress_writer: Optional[asyncio.Task] = None
         
     def _calculate_content_hash(self, user_plants: List[Dict], location: Dict[str, float]) -> str:
         """Calculate hash of user's current state to detect changes."""
-        # Create a string representing current state
-        state_data = {
-            "location": {"lat": round(location["lat"], 4), "lon": round(location["lon"], 4)},
-            "plants": []
-        }
-        
-        # Sort plants by type and health for consistent hashing
-        sorted_plants = sorted(user_plants, key=lambda p: (p.get("crop_type", ""), p.get("health", 0)))
-        
-        for plant in sorted_plants:
-            state_data["plants"].append({
-                "type": plant.get("crop_type", "unknown"),
-                "health_tier": self._get_health_tier(plant.get("health", 50)),
-                "water_tier": self._get_level_tier(plant.get("water_level", 50)),
-                "fertilizer_tier": self._get_level_tier(plant.get("fertilizer_level", 50))
-            })
+        return self._hash_state(location["lat"], location["lon"], [
+            (
+                plant.get("crop_type", "unknown"),
+                plant.get("health", 50),
+                plant.get("water_level", 50),
+                plant.get("fertilizer_level", 50),
+            )
+            for plant in user_plants
+        ])
+    
+    def _hash_state(self, lat: float, lon: float, plants: List[Tuple]) -> str:
+        """Hash a location and (crop_type, health, water_level, fertilizer_level) rows."""
+        # One token per plant; the tier lookups are inlined since this runs
+        # once per plant per request
+        tokens = [
+            f"{crop_type}:"
+            f"{HEALTH_TIERS[bisect_right(HEALTH_TIER_THRESHOLDS, health)]}:"
+            f"{LEVEL_TIERS[bisect_right(LEVEL_TIER_THRESHOLDS, water_level)]}:"
+            f"{LEVEL_TIERS[bisect_right(LEVEL_TIER_THRESHOLDS, fertilizer_level)]}"
+            for crop_type, health, water_level, fertilizer_level in plants
+        ]
+        # Sorting the tokens themselves keeps the hash independent of plant order
+        tokens.sort()
         
-        # Create hash from JSON representation
-        state_str = json.dumps(state_data, sort_keys=True)
-        return hashlib.md5(state_str.encode()).hexdigest()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{lat:.4f},{lon:.4f}\n".encode())
+        digest.update("\n".join(tokens).encode())
+        return digest.hexdigest()
     
     def _get_health_tier(self, health: float) -> str:
         """Convert health percentage to tier for content personalization."""
-        if health >= 80:
-            return "excellent"
-        elif health >= 60:
-            return "good" 
-        elif health >= 40:
-            return "fair"
-        else:
-            return "poor"
+        return HEALTH_TIERS[bisect_right(HEALTH_TIER_THRESHOLDS, health)]
     
     def _get_level_tier(self, level: float) -> str:
         """Convert water/fertilizer level to tier."""
-        if level >= 70:
-            return "high"
-        elif level >= 40:
-            return "medium"
-        else:
-            return "low"
+        return LEVEL_TIERS[bisect_right(LEVEL_TIER_THRESHOLDS, level)]
     
-    def _is_content_stale(self, generated_at: str, max_age_hours: int = 24) -> bool:
-        """Check if content is older than max_age_hours."""
-        try:
-            generated_time = datetime.fromisoformat(generated_at.replace('Z', '+00:00'))
-            age = datetime.now() - generated_time.replace(tzinfo=None)
-            return age > timedelta(hours=max_age_hours)
-        except:
-            return True  # If we can't parse the date, consider it stale
+    def _is_content_stale(self, generated_epoch: Optional[int], max_age_hours: int = 24) -> bool:
+        """Check if content generated at the given unix time is older than max_age_hours."""
+        return generated_epoch is None or time.time() - generated_epoch > max_age_hours * 3600
     
     async def get_educational_content(
         self, 
@@ -81,30 +107,24 @@ class EducationalContentManager:
     ) -> Dict[str, Any]:
         """Get educational content with smart caching and auto-updates."""
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         try:
             # Calculate current state hash
             current_hash = self._calculate_content_hash(user_plants, location)
+            cache_key = (user_id, current_hash)
             
-            # Check for existing content
-            cursor.execute("""
-                SELECT 
-                    content_hash, facts_json, missions_json, insights_json, tips_json,
-                    generated_at, plant_count, location_lat, location_lon
-                FROM educational_content 
-                WHERE user_id = ?
-            """, (user_id,))
+            cached = _content_cache.get(cache_key)
+            if cached and not force_regenerate and not self._is_content_stale(cached[0]):
+                return cached[1]
             
-            existing_content = cursor.fetchone()
+            # Check for existing content
+            existing_content = await asyncio.to_thread(self._load_content_row, user_id)
             
             # Determine if we need to regenerate content
             needs_regeneration = (
                 force_regenerate or
                 not existing_content or
                 existing_content[0] != current_hash or  # Hash changed
-                self._is_content_stale(existing_content[5]) or  # Content is stale
+                self._is_content_stale(existing_content[9]) or  # Content is stale
                 abs(existing_content[7] - location["lat"]) > 0.1 or  # Location changed significantly
                 abs(existing_content[8] - location["lon"]) > 0.1
             )
@@ -120,10 +140,13 @@ class EducationalContentManager:
                     user_level=len(user_plants)
                 )
                 
-                # Save to database
-                await self._save_content_to_db(
-                    user_id, current_hash, new_content, location, len(user_plants)
-                )
+                # Save to database in the background; the response only needs the content
+                generated_epoch = int(time.time())
+                save = asyncio.create_task(self._save_content_to_db(
+                    user_id, current_hash, new_content, location, len(user_plants), generated_epoch
+                ))
+                _pending_saves.add(save)
+                save.add_done_callback(_pending_saves.discard)
                 
                 # Add metadata
                 content_result = {
@@ -132,28 +155,29 @@ class EducationalContentManager:
                     "generated_at": datetime.now().isoformat(),
                     "content_hash": current_hash
                 }
+                _content_cache[cache_key] = (generated_epoch, {**content_result, "is_cached": True})
                 
                 logger.info(f"✅ New educational content generated for user {user_id}")
                 
             else:
-                # Use cached content
+                # Use cached content; the stored JSON is embedded in the
+                # response as-is rather than decoded and re-encoded
                 logger.info(f"Using cached educational content for user {user_id}")
                 
                 content_result = {
-                    "facts": json.loads(existing_content[1]),
-                    "interactive_missions": json.loads(existing_content[2]),
-                    "climate_insights": json.loads(existing_content[3]),
-                    "sustainability_tips": json.loads(existing_content[4]),
+                    "facts": json_fragment(existing_content[1]),
+                    "interactive_missions": json_fragment(existing_content[2]),
+                    "climate_insights": json_fragment(existing_content[3]),
+                    "sustainability_tips": json_fragment(existing_content[4]),
                     "is_cached": True,
                     "generated_at": existing_content[5],
                     "content_hash": existing_content[0]
                 }
+                _content_cache[cache_key] = (existing_content[9], content_result)
                 
-            conn.close()
             return content_result
             
         except Exception as e:
-            conn.close()
             logger.error(f"Error managing educational content: {e}")
             # Fallback to direct generation
             return await self.advisor.generate_educational_content(
@@ -163,177 +187,243 @@ class EducationalContentManager:
                 user_level=len(user_plants)
             )
     
+    def _load_content_row(self, user_id: int) -> Optional[Tuple]:
+        """Read the user's stored content row (runs in a worker thread)."""
+        with db_pool.acquire() as conn:
+            return conn.execute("""
+                SELECT 
+                    content_hash, facts_json, missions_json, insights_json, tips_json,
+                    generated_at, plant_count, location_lat, location_lon,
+                    generated_at_epoch
+                FROM educational_content 
+                WHERE user_id = ?
+            """, (user_id,)).fetchone()
+    
     async def _save_content_to_db(
         self, 
         user_id: int, 
         content_hash: str, 
         content: Dict[str, Any], 
         location: Dict[str, float],
-        plant_count: int
+        plant_count: int,
+        generated_epoch: int
     ):
         """Save educational content to database."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Convert content to JSON strings
-            facts_json = json.dumps(content.get("facts", []))
-            missions_json = json.dumps(content.get("interactive_missions", []))
-            insights_json = json.dumps(content.get("climate_insights", {}))
-            tips_json = json.dumps(content.get("sustainability_tips", []))
-            
-            now = datetime.now().isoformat()
-            
-            # Insert or update content
-            cursor.execute("""
-                INSERT OR REPLACE INTO educational_content 
-                (user_id, content_hash, facts_json, missions_json, insights_json, tips_json,
-                 location_lat, location_lon, plant_count, generated_at, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            await asyncio.to_thread(
+                self._write_content_row,
+                user_id, content_hash, content, location, plant_count, generated_epoch
+            )
+        
+        except Exception as e:
+            logger.error(f"Error saving educational content for user {user_id}: {e}")
+    
+    def _write_content_row(
+        self, 
+        user_id: int, 
+        content_hash: str, 
+        content: Dict[str, Any], 
+        location: Dict[str, float],
+        plant_count: int,
+        generated_epoch: int
+    ) -> None:
+        """Compress and store the user's content row (runs in a worker thread)."""
+        # Serialize content as compressed JSON blobs
+        facts_json = pack_json(content.get("facts", []))
+        missions_json = pack_json(content.get("interactive_missions", []))
+        insights_json = pack_json(content.get("climate_insights", {}))
+        tips_json = pack_json(content.get("sustainability_tips", []))
+        
+        now = datetime.now().isoformat()
+        
+        # Insert or update content; the with block commits the transaction
+        with write_connection() as conn, conn:
+            conn.execute(_SAVE_CONTENT_SQL, (
                 user_id, content_hash, facts_json, missions_json, insights_json, tips_json,
-                location["lat"], location["lon"], plant_count, now, now
+                location["lat"], location["lon"], plant_count, now, generated_epoch, now
             ))
-            
-            conn.commit()
-            
-        finally:
-            conn.close()
+    
+    async def wait_for_pending_saves(self) -> None:
+        """Wait for background content saves to finish."""
+        await asyncio.gather(*_pending_saves, return_exceptions=True)
     
     async def invalidate_user_content(self, user_id: int) -> bool:
         """Force regeneration of educational content for a user."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        for key in list(_content_cache):
+            if key[0] == user_id:
+                del _content_cache[key]
         
         try:
-            cursor.execute("""
-                DELETE FROM educational_content WHERE user_id = ?
-            """, (user_id,))
-            
-            conn.commit()
-            conn.close()
+            await asyncio.to_thread(self._delete_content_row, user_id)
             
             logger.info(f"Invalidated educational content for user {user_id}")
             return True
             
         except Exception as e:
-            conn.close()
             logger.error(f"Error invalidating content for user {user_id}: {e}")
             return False
     
-    def mark_content_completed(self, user_id: int, content_type: str, content_id: str, xp_earned: int = 0) -> bool:
-        """Mark educational content as completed by user."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                INSERT OR IGNORE INTO educational_progress 
-                (user_id, content_type, content_id, xp_earned)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, content_type, content_id, xp_earned))
+    def _delete_content_row(self, user_id: int) -> None:
+        """Delete the user's stored content row (runs in a worker thread)."""
+        with write_connection() as conn:
+            conn.execute("""
+                DELETE FROM educational_content WHERE user_id = ?
+            """, (user_id,))
             
             conn.commit()
-            conn.close()
+    
+    def start_progress_writer(self) -> None:
+        """Start the background task that batches completion writes."""
+        if self._progress_writer is None:
+            self._progress_queue = asyncio.Queue()
+            self._progress_writer = asyncio.create_task(self._progress_writer_loop())
+    
+    async def stop_progress_writer(self) -> None:
+        """Write any queued completions and stop the writer task."""
+        writer, self._progress_writer = self._progress_writer, None
+        if writer is None:
+            return
+        
+        # Later completions are written directly, so the sentinel is queued last
+        self._progress_queue.put_nowait(None)
+        await writer
+        self._progress_queue = None
+    
+    async def _progress_writer_loop(self) -> None:
+        """Collect queued completions into batches until the stop sentinel arrives."""
+        queue = self._progress_queue
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + PROGRESS_BATCH_WINDOW
             
-            return cursor.rowcount > 0  # Returns True if new record was inserted
+            while batch[-1] is not None and len(batch) < PROGRESS_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                await self._write_progress_batch(batch)
+            if stopping:
+                return
+    
+    async def _write_progress_batch(self, batch: List[Tuple]) -> None:
+        """Insert queued completions in one transaction and resolve their futures."""
+        try:
+            inserted = await asyncio.to_thread(
+                self._insert_progress_rows, [entry[:4] for entry in batch]
+            )
             
         except Exception as e:
-            conn.close()
             logger.error(f"Error marking content completed: {e}")
-            return False
+            inserted = [False] * len(batch)
+        
+        for (*_, future), was_inserted in zip(batch, inserted):
+            if not future.done():
+                future.set_result(was_inserted)
     
-    def get_completed_content(self, user_id: int) -> List[Dict[str, Any]]:
-        """Get list of educational content completed by user."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    def _insert_progress_rows(self, rows: List[Tuple]) -> List[bool]:
+        """INSERT OR IGNORE completion rows, reporting which were new (runs in a worker thread)."""
+        inserted = []
+        with write_connection() as conn:
+            for row in rows:
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO educational_progress 
+                    (user_id, content_type, content_id, xp_earned)
+                    VALUES (?, ?, ?, ?)
+                """, row)
+                inserted.append(cursor.rowcount > 0)
+            
+            conn.commit()
+        
+        return inserted
+    
+    async def mark_content_completed(self, user_id: int, content_type: str, content_id: str, xp_earned: int = 0) -> bool:
+        """Mark educational content as completed by user.
+        
+        Returns True once the completion is committed as a new record.
+        """
+        future = asyncio.get_running_loop().create_future()
+        entry = (user_id, content_type, content_id, xp_earned, future)
+        
+        if self._progress_writer is None:
+            await self._write_progress_batch([entry])
+        else:
+            self._progress_queue.put_nowait(entry)
         
+        return await future
+    
+    def get_completed_content(self, user_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get educational content completed by user, newest first."""
         try:
-            cursor.execute("""
-                SELECT content_type, content_id, completed_at, xp_earned
-                FROM educational_progress 
-                WHERE user_id = ?
-                ORDER BY completed_at DESC
-            """, (user_id,))
-            
-            results = cursor.fetchall()
-            conn.close()
-            
-            return [{
-                "content_type": row[0],
-                "content_id": row[1], 
-                "completed_at": row[2],
-                "xp_earned": row[3]
-            } for row in results]
+            with db_pool.acquire() as conn:
+                # Pool connections return sqlite3.Row, which dict() converts in C
+                return [dict(row) for row in conn.execute("""
+                    SELECT content_type, content_id, completed_at, xp_earned
+                    FROM educational_progress 
+                    WHERE user_id = ?
+                    ORDER BY completed_at DESC
+                    LIMIT ?
+                """, (user_id, -1 if limit is None else limit))]
             
         except Exception as e:
-            conn.close()
             logger.error(f"Error getting completed content: {e}")
             return []
     
     async def check_and_update_content_on_plant_change(self, user_id: int) -> Dict[str, Any]:
         """Check if content needs updating when user plants/farms change."""
         # This will be called automatically when user adds plants or changes location
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Get user's current farm location
-            cursor.execute("""
-                SELECT latitude, longitude FROM user_farms 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC LIMIT 1
-            """, (user_id,))
+            rows = await asyncio.to_thread(self._load_farm_state, user_id)
             
-            farm = cursor.fetchone()
-            if not farm:
+            if not rows:
                 return {"update_needed": False, "reason": "No farm found"}
             
-            latitude, longitude = farm
-            
-            # Get user's current plants
-            cursor.execute("""
-                SELECT id, name, water_level, fertilizer_level, health, planted_at 
-                FROM crops WHERE user_id = ?
-            """, (user_id,))
-            
-            plants = cursor.fetchall()
-            
-            # Convert to expected format
-            plant_data = [{
-                "crop_id": plant[0],
-                "crop_type": plant[1],
-                "water_level": plant[2],
-                "fertilizer_level": plant[3],
-                "health": plant[4],
-                "planted_at": plant[5]
-            } for plant in plants]
+            latitude, longitude, stored_hash = rows[0][0], rows[0][1], rows[0][6]
             
             # Check if content hash has changed
-            current_hash = self._calculate_content_hash(plant_data, {"lat": latitude, "lon": longitude})
-            
-            cursor.execute("""
-                SELECT content_hash FROM educational_content WHERE user_id = ?
-            """, (user_id,))
+            current_hash = self._hash_state(latitude, longitude, [
+                (row[2], row[3], row[4], row[5]) for row in rows if row[2] is not None
+            ])
             
-            existing = cursor.fetchone()
-            conn.close()
-            
-            if not existing or existing[0] != current_hash:
+            if stored_hash != current_hash:
                 return {
                     "update_needed": True, 
                     "reason": "Farm state changed",
                     "new_hash": current_hash,
-                    "old_hash": existing[0] if existing else None
+                    "old_hash": stored_hash
                 }
             
             return {"update_needed": False, "reason": "Content up to date"}
             
         except Exception as e:
-            conn.close()
             logger.error(f"Error checking content update need: {e}")
             return {"update_needed": False, "reason": f"Error: {e}"}
+    
+    def _load_farm_state(self, user_id: int) -> List[Tuple]:
+        """Latest farm location, the user's plants and the stored hash in one query (runs in a worker thread)."""
+        with db_pool.acquire() as conn:
+            return conn.execute("""
+                SELECT f.latitude, f.longitude,
+                       c.name, c.health, c.water_level, c.fertilizer_level,
+                       e.content_hash
+                FROM (
+                    SELECT latitude, longitude FROM user_farms
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC LIMIT 1
+                ) f
+                LEFT JOIN crops c ON c.user_id = ?
+                LEFT JOIN educational_content e ON e.user_id = ?
+            """, (user_id, user_id, user_id)).fetchall()
 
 
 # Global instance
-educational_manager = EducationalContentManager()
\ No newline at end of file
+educational_manager = EducationalContentManager()
@@ -45,6 +45,12 @@ CHALLENGES = [
     },
 ]
 
+# Challenges grouped by the action that advances them
+CHALLENGES_BY_TYPE = {}
+for _challenge in CHALLENGES:
+    CHALLENGES_BY_TYPE.setdefault(_challenge["challenge_type"], []).append(_challenge)
+del _challenge
+
 # Define achievements
 ACHIEVEMENTS = [
     {"id": "1", "title": "🌱 Beginner Farmer", "description": "Plant your first crop", "icon": "🌱"},
@@ -61,100 +67,115 @@ def calculate_level(xp: int) -> int:
     return (xp // 100) + 1
 
 
+ACTION_REWARDS = {
+    "plant": (10, -10),  # XP, coins (negative = cost)
+    "water": (5, 2),
+    "fertilize": (8, -10),
+    "harvest": (50, 100),
+}
+
+
 def get_action_rewards(action: str) -> tuple[int, int]:
     """Get XP and coins for an action."""
-    rewards = {
-        "plant": (10, -10),  # XP, coins (negative = cost)
-        "water": (5, 2),
-        "fertilize": (8, -10),
-        "harvest": (50, 100),
-    }
-    return rewards.get(action, (0, 0))
+    return ACTION_REWARDS.get(action, (0, 0))
 
 
 def update_challenge_progress(conn, user_id: int, action: str, amount: int = 1):
-    """Update challenge progress for user."""
-    cursor = conn.cursor()
-    
+    """Update challenge progress for user.
+
+    Writes inside the caller's transaction; the caller commits.
+    """
     # Find challenges matching this action type
-    matching_challenges = [c for c in CHALLENGES if c["challenge_type"] == action]
+    matching_challenges = CHALLENGES_BY_TYPE.get(action, ())
+    if not matching_challenges:
+        return 0, 0
     
+    # Fetch the user's rows for every matching challenge in one query
+    placeholders = ", ".join("?" for _ in matching_challenges)
+    rows = conn.execute(
+        f"SELECT challenge_id, progress, completed FROM user_challenges "
+        f"WHERE user_id = ? AND challenge_id IN ({placeholders})",
+        (user_id, *(c["id"] for c in matching_challenges))
+    ).fetchall()
+    existing = {row[0]: (row[1], row[2]) for row in rows}
+    
+    to_insert = []
+    to_update = []
+    rewards = (0, 0)
     for challenge in matching_challenges:
-        # Check if challenge exists for user
-        cursor.execute(
-            "SELECT progress, completed FROM user_challenges WHERE user_id = ? AND challenge_id = ?",
-            (user_id, challenge["id"])
-        )
-        result = cursor.fetchone()
+        result = existing.get(challenge["id"])
         
         if result is None:
             # Create challenge entry
-            cursor.execute(
-                "INSERT INTO user_challenges (user_id, challenge_id, progress) VALUES (?, ?, ?)",
-                (user_id, challenge["id"], min(amount, challenge["target"]))
-            )
+            to_insert.append((user_id, challenge["id"], min(amount, challenge["target"])))
         elif not result[1]:  # Not completed
             new_progress = min(result[0] + amount, challenge["target"])
             completed = new_progress >= challenge["target"]
             
             if completed:
-                cursor.execute(
-                    "UPDATE user_challenges SET progress = ?, completed = 1, completed_at = ? WHERE user_id = ? AND challenge_id = ?",
-                    (new_progress, datetime.now().isoformat(), user_id, challenge["id"])
+                to_update.append(
+                    (new_progress, 1, datetime.now().isoformat(), user_id, challenge["id"])
                 )
                 # Award challenge rewards
-                return challenge["reward_xp"], challenge["reward_coins"]
-            else:
-                cursor.execute(
-                    "UPDATE user_challenges SET progress = ? WHERE user_id = ? AND challenge_id = ?",
-                    (new_progress, user_id, challenge["id"])
-                )
+                rewards = (challenge["reward_xp"], challenge["reward_coins"])
+                break
+            to_update.append((new_progress, 0, None, user_id, challenge["id"]))
     
-    conn.commit()
-    return 0, 0
+    if to_insert:
+        conn.executemany(
+            "INSERT INTO user_challenges (user_id, challenge_id, progress) VALUES (?, ?, ?)",
+            to_insert
+        )
+    if to_update:
+        conn.executemany(
+            "UPDATE user_challenges SET progress = ?, completed = ?, completed_at = ? "
+            "WHERE user_id = ? AND challenge_id = ?",
+            to_update
+        )
+    return rewards
+
+
+# Achievements unlocked straight from stats: (achievement id, stat, default, threshold)
+STAT_ACHIEVEMENTS = [
+    ("1", "total_plants", 0, 1),  # Plant first crop
+    ("2", "total_waters", 0, 50),  # Water 50 crops
+    ("4", "level", 1, 10),  # Reach level 10
+    ("5", "coins", 0, 1000),  # Earn 1000 coins
+]
+
+# One multi-row INSERT per possible batch size, built once so SQLite's
+# statement cache reuses the same few texts
+_UNLOCK_SQL = {
+    count: "INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at) VALUES "
+    + ", ".join(["(?, ?, ?)"] * count)
+    for count in range(1, len(STAT_ACHIEVEMENTS) + 1)
+}
 
 
 def check_and_unlock_achievements(conn, user_id: int, stats: dict):
-    """Check and unlock achievements based on stats."""
-    cursor = conn.cursor()
-    
-    unlocked = []
-    
-    # Achievement 1: Plant first crop
-    if stats.get("total_plants", 0) >= 1:
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?)",
-            (user_id, "1", datetime.now().isoformat())
-        )
-        if cursor.rowcount > 0:
-            unlocked.append("1")
-    
-    # Achievement 2: Water 50 crops
-    if stats.get("total_waters", 0) >= 50:
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?)",
-            (user_id, "2", datetime.now().isoformat())
-        )
-        if cursor.rowcount > 0:
-            unlocked.append("2")
+    """Check and unlock achievements based on stats.
+
+    Writes inside the caller's transaction; the caller commits.
+    """
+    eligible = [
+        achievement_id
+        for achievement_id, stat, default, threshold in STAT_ACHIEVEMENTS
+        if (stats.get(stat) or default) >= threshold
+    ]
+    if not eligible:
+        return []
     
-    # Achievement 4: Reach level 10
-    if stats.get("level", 1) >= 10:
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?)",
-            (user_id, "4", datetime.now().isoformat())
+    already_unlocked = {
+        row[0] for row in conn.execute(
+            "SELECT achievement_id FROM user_achievements WHERE user_id = ?", (user_id,)
         )
-        if cursor.rowcount > 0:
-            unlocked.append("4")
+    }
+    unlocked = [achievement_id for achievement_id in eligible if achievement_id not in already_unlocked]
     
-    # Achievement 5: Earn 1000 coins
-    if stats.get("coins", 0) >= 1000:
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?)",
-            (user_id, "5", datetime.now().isoformat())
-        )
-        if cursor.rowcount > 0:
-            unlocked.append("5")
+    if not unlocked:
+        return []
     
-    conn.commit()
+    now = datetime.now().isoformat()
+    params = [value for achievement_id in unlocked for value in (user_id, achievement_id, now)]
+    conn.execute(_UNLOCK_SQL[len(unlocked)], params)
     return unlocked
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 import random
+import time
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import Any, AsyncIterator, Dict, List
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-from fastapi import Depends, FastAPI, HTTPException, Query, status
+import orjson
+from cachetools import TTLCache
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 
 from .achievements import AchievementsService
 from .ai import AIAdvisor
-from .auth import authenticate_user, create_access_token, get_current_user, get_password_hash
+from .auth import (
+    authenticate_user,
+    create_access_token,
+    get_current_auth_user,
+    get_current_user,
+    get_password_hash_async,
+)
 from .avatar_service import avatar_service
 from .auth_schemas import (
     LanguageUpdate,
@@ -26,37 +38,28 @@ from .auth_schemas import (
     WelcomeBonusResponse,
 )
 from .config import get_settings
-from .database import UserDB, get_db_connection
+from .database import (
+    HAS_RETURNING, UserDB, db_pool, ensure_db, get_db_connection, query_catalog, write_connection,
+)
 
 
 def serialize_user(user: dict | None) -> dict:
-    """Normalize user row for API responses."""
+    """Normalize user row for API responses.
+
+    Handlers return the dict as is; FastAPI validates it once against the
+    endpoint's response model, which coerces the counters and normalizes the avatar.
+    """
     if not user:
         return {}
 
-    normalized = user.copy()
-    normalized.pop("password_hash", None)
-    normalized["coins"] = int(normalized.get("coins") or 0)
-    normalized["xp"] = int(normalized.get("xp") or 0)
-    normalized["welcome_bonus_claimed"] = bool(normalized.get("welcome_bonus_claimed"))
-    
-    # Ensure avatar exists and is normalized to PNG for RN compatibility
-    try:
-        if not normalized.get("avatar_url"):
-            normalized["avatar_url"] = avatar_service.ensure_user_has_avatar(normalized)
-        else:
-            normalized["avatar_url"] = avatar_service.normalize_avatar_url(normalized.get("avatar_url"))
-    except:
-        normalized["avatar_url"] = normalized.get("avatar_url") or None
-
-    created_at = normalized.get("created_at")
-    if created_at is not None:
-        normalized["created_at"] = str(created_at)
-
-    last_login = normalized.get("last_login")
-    normalized["last_login"] = str(last_login) if last_login else None
+    # Ensure avatar exists; UserResponse normalizes it to PNG for RN compatibility
+    if not user.get("avatar_url"):
+        try:
+            user = {**user, "avatar_url": avatar_service.ensure_user_has_avatar(user)}
+        except Exception:
+            pass
 
-    return normalized
+    return dict(user)
 from .nasa_client import NASAClient, NASAClientError, to_daily_series
 from .recommendations import Recommendation
 from .schemas import (
@@ -69,24 +72,36 @@ from .game_schemas import (
 )
 from .scenario_ai import ScenarioGenerator
 from .challenges import ChallengesService
-from .activity_tracker import log_activity, check_completable_challenges
+from .activity_tracker import (
+    check_achievements_for_user, check_completable_challenges, flush_activity_stats, log_activity,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    global _nasa_client
+    from .educational_manager import educational_manager
+    
+    ensure_db()
+    educational_manager.start_progress_writer()
+    yield
+    await educational_manager.wait_for_pending_saves()
+    await educational_manager.stop_progress_writer()
+    await asyncio.to_thread(UserDB.flush_last_logins)
+    await asyncio.to_thread(flush_activity_stats)
+    if _nasa_client is not None:
+        await _nasa_client.close()
+        _nasa_client = None
+
 
 app = FastAPI(
     title="Fasal Seva – NASA Farm Navigator Backend",
     version="0.1.0",
     description="Backend service providing NASA POWER data and AI-guided farming insights.",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Add CORS middleware for mobile app access
+# Configure CORS for the web and mobile clients
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -94,7 +109,7 @@ app.add_middleware(
         "http://localhost:19006",  # Expo web
         "http://localhost:8081",   # Expo metro bundler
         "exp://localhost:19000",   # Expo development
-        "*"  # Allow all origins for development
+        "*"  # Allow all origins for development; in production, list specific origins
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
@@ -102,8 +117,19 @@ app.add_middleware(
 )
 
 
+# Stateless apart from settings, so one advisor serves every request
+ai_advisor = AIAdvisor()
+
+# One NASAClient per process so POWER requests reuse pooled keep-alive
+# connections; created on first use and closed on shutdown.
+_nasa_client: NASAClient | None = None
+
+
 async def get_nasa_client() -> NASAClient:
-    return NASAClient()
+    global _nasa_client
+    if _nasa_client is None:
+        _nasa_client = NASAClient()
+    return _nasa_client
 
 
 @app.get("/")
@@ -121,32 +147,32 @@ async def root(settings=Depends(get_settings)) -> Dict[str, Any]:
 # AUTHENTICATION ENDPOINTS
 # ========================================
 
+# Username -> taken, for signup forms that check on every keystroke. Signup
+# marks new names taken; other workers may lag by at most the TTL, and the
+# UNIQUE constraint still rejects a duplicate signup.
+_username_taken: TTLCache = TTLCache(maxsize=10_000, ttl=5)
+
+
 @app.get("/auth/username-available")
 async def username_available(username: str = Query(..., min_length=3, max_length=50)) -> Dict[str, Any]:
     """Check if a username is available (case-insensitive)."""
     normalized = username.strip().lower()
-    exists = UserDB.get_user_by_username(normalized) is not None
+    exists = _username_taken.get(normalized)
+    if exists is None:
+        exists = _username_taken[normalized] = UserDB.get_user_by_username(normalized) is not None
     return {"username": normalized, "available": not exists}
 
 @app.post("/auth/signup", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserSignup):
     """Register a new user."""
-    # Normalize for case-insensitive uniqueness
-    normalized_email = user_data.email.lower()
-    normalized_username = user_data.username.lower()
-
-    # Check if user already exists
-    existing_user = UserDB.get_user_by_email(normalized_email)
-    if existing_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
-    
-    existing_user = UserDB.get_user_by_username(normalized_username)
-    if existing_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
-    
-    # Hash password and create user
-    password_hash = get_password_hash(user_data.password)
-    user_id = UserDB.create_user(
+    # UserSignup already lowercased email and username
+    normalized_email = user_data.email
+    normalized_username = user_data.username
+
+    # Hash password and create user; the UNIQUE constraints catch duplicates
+    password_hash = await get_password_hash_async(user_data.password)
+    user = await asyncio.to_thread(
+        UserDB.create_user,
         email=normalized_email,
         username=normalized_username,
         password_hash=password_hash,
@@ -154,26 +180,24 @@ async def signup(user_data: UserSignup):
         language=user_data.language
     )
     
-    if user_id is None:
-        # Likely a race condition on uniqueness; report conflict for better UX
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email or username already registered")
+    if user is None:
+        if UserDB.taken_identity(normalized_email) == "email":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
     
-    # Get created user
-    user = serialize_user(UserDB.get_user_by_id(user_id))
+    _username_taken[normalized_username] = True
+    user = serialize_user(user)
     
     # Create access token
-    access_token = create_access_token(data={"sub": str(user_id)})
+    access_token = create_access_token(data={"sub": str(user["id"])})
     
-    return TokenResponse(
-        access_token=access_token,
-        user=UserResponse(**user)
-    )
+    return {"access_token": access_token, "user": user}
 
 
 @app.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     """Login with username/email and password."""
-    user = authenticate_user(credentials.username_or_email, credentials.password)
+    user = await authenticate_user(credentials.username_or_email, credentials.password)
     
     if not user:
         raise HTTPException(
@@ -186,69 +210,37 @@ async def login(credentials: UserLogin):
 
     # Auto-grant welcome bonus on first login if not claimed
     if not user.get("welcome_bonus_claimed", False):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Grant 1000 welcome bonus coins (users table only)
-        cursor.execute("""
-            UPDATE users SET coins = coins + 1000, welcome_bonus_claimed = 1 
-            WHERE id = ?
-        """, (user["id"],))
-        
-        # Create user_progress record for game statistics (no coins)
-        cursor.execute("""
-            INSERT OR IGNORE INTO user_progress (user_id, level, total_scenarios_completed, successful_harvests)
-            VALUES (?, 1, 0, 0)
-        """, (user["id"],))
-        
-        conn.commit()
-        conn.close()
-        
-        # Update user object for return
-        user["coins"] = (user.get("coins", 0) or 0) + 1000
-        user["welcome_bonus_claimed"] = True
+        new_total = await asyncio.to_thread(UserDB.grant_welcome_bonus, user["id"])
+        if new_total is not None:
+            # Update user object for return
+            user["coins"] = new_total
+            user["welcome_bonus_claimed"] = True
 
     # Create access token
     access_token = create_access_token(data={"sub": str(user["id"])})
     
-    return TokenResponse(
-        access_token=access_token,
-        user=UserResponse(**user)
-    )
+    return {"access_token": access_token, "user": user}
 
 
 @app.post("/auth/claim-welcome-bonus", response_model=WelcomeBonusResponse)
-async def claim_welcome_bonus(current_user: dict = Depends(get_current_user)):
+async def claim_welcome_bonus(current_user: dict = Depends(get_current_auth_user)):
     """Allow user to claim one-time welcome bonus coins."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT coins, welcome_bonus_claimed FROM users WHERE id = ?",
-        (current_user["id"],),
-    )
-    row = cursor.fetchone()
+    with db_pool.acquire() as conn:
+        row = conn.execute(
+            "SELECT welcome_bonus_claimed FROM users WHERE id = ?",
+            (current_user["id"],),
+        ).fetchone()
 
     if not row:
-        conn.close()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    coins, claimed = row
-    coins = coins or 0
-    claimed = bool(claimed)
-
-    if claimed:
-        conn.close()
+    # The grant re-checks the flag under the write lock, so concurrent claims pay once
+    new_total = None
+    if not row["welcome_bonus_claimed"]:
+        new_total = await asyncio.to_thread(UserDB.grant_welcome_bonus, current_user["id"])
+    if new_total is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Welcome bonus already claimed")
 
-    new_total = coins + 1000
-    cursor.execute(
-        "UPDATE users SET coins = ?, welcome_bonus_claimed = 1 WHERE id = ?",
-        (new_total, current_user["id"]),
-    )
-    conn.commit()
-    conn.close()
-
     return WelcomeBonusResponse(
         message="Welcome bonus claimed successfully!",
         coins_awarded=1000,
@@ -259,31 +251,19 @@ async def claim_welcome_bonus(current_user: dict = Depends(get_current_user)):
 @app.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current authenticated user information."""
-    return UserResponse(**serialize_user(current_user))
+    return serialize_user(current_user)
 
 
 @app.put("/auth/language", response_model=UserResponse)
 async def update_language(
     language_data: LanguageUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Update user's preferred language."""
-    from .database import get_db_connection
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET language = ? WHERE id = ?",
-        (language_data.language, current_user["id"])
-    )
-    conn.commit()
-    conn.close()
+    await asyncio.to_thread(UserDB.update_language, current_user["id"], language_data.language)
     
-    # Get updated user
-    updated_user = UserDB.get_user_by_id(current_user["id"])
-    updated_user.pop("password_hash", None)
-    
-    return UserResponse(**updated_user)
+    # Get updated user; the response model drops password_hash with the other extra columns
+    return UserDB.get_user_by_id(current_user["id"])
 
 
 # =====================
@@ -327,7 +307,7 @@ async def get_current_avatar(current_user: dict = Depends(get_current_user)):
 @app.put("/avatar")
 async def update_avatar(
     avatar_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Update user's avatar."""
     try:
@@ -361,66 +341,53 @@ async def test_avatar_generation(current_user: dict = Depends(get_current_user))
 # =====================
 
 @app.get("/farms", response_model=list[FarmResponse])
-async def list_farms(current_user: dict = Depends(get_current_user)):
+async def list_farms(current_user: dict = Depends(get_current_auth_user)):
     """List farms for the current user."""
-    from .database import get_db_connection
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, farm_name, latitude, longitude, crop_type, farm_size, created_at FROM user_farms WHERE user_id = ? ORDER BY created_at DESC",
-        (current_user["id"],),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    farms = [
-        {
-            "id": r[0],
-            "farm_name": r[1],
-            "latitude": r[2],
-            "longitude": r[3],
-            "crop_type": r[4],
-            "farm_size": r[5],
-            "created_at": str(r[6]),
-        }
-        for r in rows
-    ]
-    return farms
+    # Rows go straight to orjson; response_model only documents the shape
+    with db_pool.acquire() as conn:
+        farms = [dict(row) for row in conn.execute(
+            "SELECT id, farm_name, latitude, longitude, crop_type, farm_size, CAST(created_at AS TEXT) AS created_at FROM user_farms WHERE user_id = ? ORDER BY user_farms.created_at DESC",
+            (current_user["id"],),
+        )]
+    return ORJSONResponse(farms)
+
+
+_FARM_COLS = "id, farm_name, latitude, longitude, crop_type, farm_size, created_at"
+_INSERT_FARM_SQL = """
+    INSERT INTO user_farms (user_id, farm_name, latitude, longitude, crop_type, farm_size)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_INSERT_FARM_RETURNING_SQL = f"{_INSERT_FARM_SQL} RETURNING {_FARM_COLS}"
+
+
+def _insert_farm(params: tuple):
+    """Insert a farm on the writer connection and return its row; run via asyncio.to_thread."""
+    with write_connection() as conn, conn:
+        if HAS_RETURNING:
+            return conn.execute(_INSERT_FARM_RETURNING_SQL, params).fetchone()
+        farm_id = conn.execute(_INSERT_FARM_SQL, params).lastrowid
+        return conn.execute(
+            f"SELECT {_FARM_COLS} FROM user_farms WHERE id = ?", (farm_id,)
+        ).fetchone()
 
 
 @app.post("/farms", response_model=FarmResponse, status_code=201)
 async def create_farm(payload: FarmCreate, current_user: dict = Depends(get_current_user)):
     """Create a farm for the current user."""
-    print(f"Creating farm for user {current_user.get('id')}: {payload}")
+    logger.debug("Creating farm for user %s: %r", current_user.get("id"), payload)
+    params = (
+        current_user["id"],
+        payload.farm_name,
+        payload.latitude,
+        payload.longitude,
+        payload.crop_type,
+        payload.farm_size,
+    )
     try:
-        from .database import get_db_connection
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO user_farms (user_id, farm_name, latitude, longitude, crop_type, farm_size)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                current_user["id"],
-                payload.farm_name,
-                payload.latitude,
-                payload.longitude,
-                payload.crop_type,
-                payload.farm_size,
-            ),
-        )
+        row = await asyncio.to_thread(_insert_farm, params)
     except Exception as e:
-        print(f"Error creating farm: {e}")
-        print(f"Payload: {payload}")
+        logger.error("Error creating farm: %s (payload: %r)", e, payload)
         raise HTTPException(status_code=400, detail=f"Error creating farm: {str(e)}")
-    farm_id = cur.lastrowid
-    conn.commit()
-    cur.execute(
-        "SELECT id, farm_name, latitude, longitude, crop_type, farm_size, created_at FROM user_farms WHERE id = ?",
-        (farm_id,),
-    )
-    row = cur.fetchone()
-    conn.close()
     return FarmResponse(
         id=row[0],
         farm_name=row[1],
@@ -432,33 +399,35 @@ async def create_farm(payload: FarmCreate, current_user: dict = Depends(get_curr
     )
 
 
-@app.get("/date-ranges")
-async def get_date_ranges():
-    """Get suggested date ranges for NASA POWER data."""
-    from datetime import datetime, timedelta
-    today = datetime.now()
-    
+@lru_cache(maxsize=1)
+def _date_ranges(today: date) -> Dict[str, Any]:
+    """Suggested ranges for ``today``; cached until the date rolls over."""
     # NASA POWER data has ~2-3 day lag
     max_end = today - timedelta(days=3)
+    max_end_str = max_end.strftime("%Y%m%d")
     
-    ranges = {
+    return {
         "last_week": {
             "start": (max_end - timedelta(days=7)).strftime("%Y%m%d"),
-            "end": max_end.strftime("%Y%m%d"),
+            "end": max_end_str,
         },
         "last_month": {
             "start": (max_end - timedelta(days=30)).strftime("%Y%m%d"),
-            "end": max_end.strftime("%Y%m%d"),
+            "end": max_end_str,
         },
         "last_season": {
             "start": (max_end - timedelta(days=90)).strftime("%Y%m%d"),
-            "end": max_end.strftime("%Y%m%d"),
+            "end": max_end_str,
         },
-        "max_end_date": max_end.strftime("%Y%m%d"),
+        "max_end_date": max_end_str,
         "note": "NASA POWER data has a 2-3 day lag. Use dates ending before the max_end_date."
     }
-    
-    return ranges
+
+
+@app.get("/date-ranges")
+async def get_date_ranges():
+    """Get suggested date ranges for NASA POWER data."""
+    return _date_ranges(date.today())
 
 
 @app.get("/farm-data", response_model=FarmDataResponse)
@@ -472,7 +441,7 @@ async def farm_data(
         description="Optional crop type for AI personalization",
     ),
     nasa_client: NASAClient = Depends(get_nasa_client),
-) -> FarmDataResponse:
+) -> ORJSONResponse:
     if end < start:
         raise HTTPException(status_code=400, detail="end date must not be earlier than start date")
 
@@ -497,18 +466,15 @@ async def farm_data(
             raise HTTPException(status_code=400, detail=error_msg) from exc
         raise HTTPException(status_code=502, detail="Failed to fetch data from NASA POWER") from exc
 
-    daily_records = [
-        _normalise_keys(record)
-        for record in to_daily_series(parameter_data)
-    ]
-
-    advisor = AIAdvisor()
-    recommendation = await advisor.advise(parameter_data, crop_type=crop_type)
-
-    # Close the NASA client
-    await nasa_client.close()
+    # The advisor (possibly an LLM call) overlaps with building the daily series
+    recommendation, daily_records = await asyncio.gather(
+        ai_advisor.advise(parameter_data, crop_type=crop_type),
+        asyncio.to_thread(_daily_records, parameter_data),
+    )
 
-    return FarmDataResponse(
+    # Validated once here and handed to orjson; returning the model itself
+    # would make FastAPI validate and encode it a second time
+    response = FarmDataResponse(
         location={"lat": lat, "lon": lon},
         period={"start": start, "end": end},
         crop_type=crop_type,
@@ -516,29 +482,23 @@ async def farm_data(
         daily=daily_records,
         recommendation=RecommendationPayload(**recommendation.__dict__),
     )
+    return ORJSONResponse(response.model_dump())
+
+
+def _daily_records(parameter_data: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
+    return [_normalise_keys(record) for record in to_daily_series(parameter_data)]
 
 
 def _normalise_keys(record: Dict[str, Any]) -> Dict[str, Any]:
-    mapping = {
-        "t2m": "t2m",
-        "rh2m": "rh2m",
-        "prectot": "prectot",
-        "sza": "sza",
-        "ws2m": "ws2m",
-    }
-    normalised = {"date": record["date"]}
-    for key, value in record.items():
-        if key == "date":
-            continue
-        normalised[mapping.get(key, key)] = value
+    # to_daily_series already lowercases parameter keys into a fresh dict per
+    # day, so the record is filled in place rather than copied
     # If PRECTOT missing but PRECTOTCORR exists, map it
-    if normalised.get("prectot") in (None, "") and "prectotcorr" in record:
+    if record.get("prectot") in (None, "") and "prectotcorr" in record:
         try:
-            corr_val = float(record.get("prectotcorr"))
-            normalised["prectot"] = corr_val
-        except Exception:
+            record["prectot"] = float(record["prectotcorr"])
+        except (TypeError, ValueError):
             pass
-    return normalised
+    return record
 
 
 # ========================================
@@ -551,55 +511,93 @@ from .game_logic import (
 )
 
 
-@app.post("/farm/start", response_model=FarmStateResponse)
-async def start_farm(farm_id: int, current_user: dict = Depends(get_current_user)):
-    """Initialize or get farm state."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if farm exists and belongs to user
-    cursor.execute("SELECT id FROM user_farms WHERE id = ? AND user_id = ?", (farm_id, current_user["id"]))
-    farm = cursor.fetchone()
-    
-    if not farm:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Farm not found")
-    
-    # Check if farm state exists
-    cursor.execute("SELECT * FROM farm_state WHERE farm_id = ?", (farm_id,))
-    state = cursor.fetchone()
-    
-    if not state:
-        # Create initial state
-        cursor.execute(
-            """INSERT INTO farm_state (farm_id, user_id, crops_json, xp, level, coins) 
-               VALUES (?, ?, ?, 0, 1, 0)""",
-            (farm_id, current_user["id"], "[]")
-        )
-        conn.commit()
+# Keeps user_ranking at the best xp/level over the user's farms; farm xp and
+# level only grow, so MAX() against the stored row is enough.
+_UPSERT_RANKING_SQL = """
+    INSERT INTO user_ranking (user_id, xp, level) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        xp = MAX(xp, excluded.xp), level = MAX(level, excluded.level)
+"""
+
+
+# Farm actions and the user_stats counter each one bumps. All actions share
+# one UPDATE, with a 1 increment for the matching counter and 0 for the rest.
+_ACTION_STATS = {
+    "plant": "total_plants",
+    "water": "total_waters",
+    "fertilize": "total_fertilizes",
+    "harvest": "total_harvests",
+}
+_BUMP_ACTION_STATS_SQL = "UPDATE user_stats SET {} WHERE user_id = ?".format(
+    ", ".join(f"{column} = {column} + ?" for column in _ACTION_STATS.values())
+)
+
+# Only "plant" changes a farm's crop list, and it appends in SQL with
+# json_insert, so actions never parse or re-serialize crops_json in Python.
+_UPDATE_FARM_STATE_SQL = """
+    UPDATE farm_state SET xp = ?, level = ?, coins = ?, last_updated = ?
+    WHERE farm_id = ? AND user_id = ?
+"""
+_PLANT_FARM_STATE_SQL = """
+    UPDATE farm_state SET
+        crops_json = json_insert(COALESCE(crops_json, '[]'), '$[#]', json_object(
+            'id', 'crop_' || json_array_length(COALESCE(crops_json, '[]')) || '_' || ?,
+            'type', ?, 'planted_at', ?, 'growth', 0, 'health', 100
+        )),
+        xp = ?, level = ?, coins = ?, last_updated = ?
+    WHERE farm_id = ? AND user_id = ?
+"""
+
+
+def _unlock_achievements(user_id: int, stats: dict) -> None:
+    """check_and_unlock_achievements() in its own transaction, for background tasks."""
+    with write_connection() as conn, conn:
+        check_and_unlock_achievements(conn, user_id, stats)
+
+
+def _start_farm(farm_id: int, user_id: int) -> FarmStateResponse:
+    """Load the farm's state, creating it on first use; run via asyncio.to_thread."""
+    with write_connection() as conn:
+        cursor = conn.cursor()
         
-        # Create user stats
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)",
-            (current_user["id"],)
-        )
-        conn.commit()
+        # Check if farm exists and belongs to user
+        cursor.execute("SELECT id FROM user_farms WHERE id = ? AND user_id = ?", (farm_id, user_id))
+        farm = cursor.fetchone()
         
-        conn.close()
-        return FarmStateResponse(
-            farm_id=farm_id,
-            user_id=current_user["id"],
-            crops=[],
-            xp=0,
-            level=1,
-            coins=0,
-            last_updated=datetime.now().isoformat()
-        )
+        if not farm:
+            raise HTTPException(status_code=404, detail="Farm not found")
+        
+        # Check if farm state exists
+        cursor.execute("SELECT * FROM farm_state WHERE farm_id = ?", (farm_id,))
+        state = cursor.fetchone()
+        
+        if not state:
+            # Create initial state and user stats
+            with conn:
+                cursor.execute(
+                    """INSERT INTO farm_state (farm_id, user_id, crops_json, xp, level, coins) 
+                       VALUES (?, ?, ?, 0, 1, 0)""",
+                    (farm_id, user_id, "[]")
+                )
+                cursor.execute(
+                    "INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)",
+                    (user_id,)
+                )
+                cursor.execute(_UPSERT_RANKING_SQL, (user_id, 0, 1))
+            
+            return FarmStateResponse(
+                farm_id=farm_id,
+                user_id=user_id,
+                crops=[],
+                xp=0,
+                level=1,
+                coins=0,
+                last_updated=datetime.now().isoformat()
+            )
     
-    conn.close()
     return FarmStateResponse(
         farm_id=farm_id,
-        user_id=current_user["id"],
+        user_id=user_id,
         crops=json.loads(state[3]),
         xp=state[4],
         level=state[5],
@@ -608,133 +606,128 @@ async def start_farm(farm_id: int, current_user: dict = Depends(get_current_user
     )
 
 
+@app.post("/farm/start", response_model=FarmStateResponse)
+async def start_farm(farm_id: int, current_user: dict = Depends(get_current_auth_user)):
+    """Initialize or get farm state."""
+    return await asyncio.to_thread(_start_farm, farm_id, current_user["id"])
+
+
 @app.get("/farm/state/{farm_id}", response_model=FarmStateResponse)
-async def get_farm_state(farm_id: int, current_user: dict = Depends(get_current_user)):
+async def get_farm_state(farm_id: int, current_user: dict = Depends(get_current_auth_user)):
     """Get current farm state."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT * FROM farm_state WHERE farm_id = ? AND user_id = ?",
-        (farm_id, current_user["id"])
-    )
-    state = cursor.fetchone()
-    conn.close()
+    with db_pool.acquire() as conn:
+        state = conn.execute(
+            """SELECT crops_json, xp, level, coins, CAST(last_updated AS TEXT)
+               FROM farm_state WHERE farm_id = ? AND user_id = ?""",
+            (farm_id, current_user["id"])
+        ).fetchone()
     
     if not state:
         raise HTTPException(status_code=404, detail="Farm state not found. Initialize with /farm/start")
     
-    return FarmStateResponse(
-        farm_id=farm_id,
-        user_id=current_user["id"],
-        crops=json.loads(state[3]),
-        xp=state[4],
-        level=state[5],
-        coins=state[6],
-        last_updated=str(state[7])
-    )
+    # crops_json is only ever written as a JSON array (see _PLANT_FARM_STATE_SQL),
+    # so it is embedded as-is instead of being parsed and re-encoded
+    return ORJSONResponse({
+        "farm_id": farm_id,
+        "user_id": current_user["id"],
+        "crops": orjson.Fragment(state[0] or "[]"),
+        "xp": state[1],
+        "level": state[2],
+        "coins": state[3],
+        "last_updated": str(state[4]),
+    })
 
 
-@app.post("/farm/action", response_model=FarmActionResponse)
-async def perform_farm_action(
-    action_data: FarmActionRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    """Perform a farm action: plant, water, fertilize, harvest."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get current farm state
-    cursor.execute(
-        "SELECT crops_json, xp, level, coins FROM farm_state WHERE farm_id = ? AND user_id = ?",
-        (action_data.farm_id, current_user["id"])
-    )
-    state = cursor.fetchone()
-    
-    if not state:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Farm state not found")
-    
-    crops = json.loads(state[0])
-    current_xp = state[1]
-    current_level = state[2]
-    current_coins = state[3]
-    
-    # Get action rewards
-    base_xp, coins_change = get_action_rewards(action_data.action)
-    
-    # Validate action
-    if action_data.action == "plant":
-        if current_coins + coins_change < 0:
-            conn.close()
-            raise HTTPException(status_code=400, detail="Not enough coins")
-        # Add crop to crops list (simplified)
-        new_crop = {
-            "id": f"crop_{len(crops)}_{datetime.now().timestamp()}",
-            "type": action_data.crop_type or "wheat",
-            "planted_at": datetime.now().isoformat(),
-            "growth": 0,
-            "health": 100
-        }
-        crops.append(new_crop)
+def _apply_farm_action(action_data: FarmActionRequest, user_id: int) -> tuple[int, int, int, int, int]:
+    """Apply a farm action in one writer transaction; run via asyncio.to_thread.
+
+    Returns the xp and coins earned and the farm's new xp, coins and level.
+    """
+    with write_connection() as conn:
+        cursor = conn.cursor()
         
-        # Update stats
-        cursor.execute(
-            "UPDATE user_stats SET total_plants = total_plants + 1 WHERE user_id = ?",
-            (current_user["id"],)
-        )
+        # Take the write lock before reading, so concurrent actions on the same
+        # farm cannot both apply their changes to the same starting state
+        cursor.execute("BEGIN IMMEDIATE")
         
-    elif action_data.action == "water":
-        # Update stats
+        # Get current farm state
         cursor.execute(
-            "UPDATE user_stats SET total_waters = total_waters + 1 WHERE user_id = ?",
-            (current_user["id"],)
+            "SELECT xp, level, coins FROM farm_state WHERE farm_id = ? AND user_id = ?",
+            (action_data.farm_id, user_id)
         )
+        state = cursor.fetchone()
         
-    elif action_data.action == "fertilize":
-        if current_coins + coins_change < 0:
-            conn.close()
+        if not state:
+            raise HTTPException(status_code=404, detail="Farm state not found")
+        
+        current_xp = state[0]
+        current_level = state[1]
+        current_coins = state[2]
+        
+        # Get action rewards
+        base_xp, coins_change = get_action_rewards(action_data.action)
+        
+        # Validate action
+        if action_data.action in ("plant", "fertilize") and current_coins + coins_change < 0:
             raise HTTPException(status_code=400, detail="Not enough coins")
-        # Update stats
-        cursor.execute(
-            "UPDATE user_stats SET total_fertilizes = total_fertilizes + 1 WHERE user_id = ?",
-            (current_user["id"],)
-        )
         
-    elif action_data.action == "harvest":
         # Update stats
-        cursor.execute(
-            "UPDATE user_stats SET total_harvests = total_harvests + 1 WHERE user_id = ?",
-            (current_user["id"],)
-        )
+        if action_data.action in _ACTION_STATS:
+            cursor.execute(
+                _BUMP_ACTION_STATS_SQL,
+                (*(int(action_data.action == action) for action in _ACTION_STATS), user_id)
+            )
+        
+        # Update challenge progress and get bonus rewards
+        bonus_xp, bonus_coins = update_challenge_progress(conn, user_id, action_data.action)
+        
+        # Calculate new values
+        total_xp_earned = base_xp + bonus_xp
+        total_coins_earned = coins_change + bonus_coins
+        new_xp = current_xp + total_xp_earned
+        new_coins = current_coins + total_coins_earned
+        new_level = calculate_level(new_xp)
+        
+        # Update farm state
+        now = datetime.now()
+        if action_data.action == "plant":
+            # Add crop to crops list (simplified)
+            cursor.execute(
+                _PLANT_FARM_STATE_SQL,
+                (str(now.timestamp()), action_data.crop_type or "wheat", now.isoformat(),
+                 new_xp, new_level, new_coins, now.isoformat(), action_data.farm_id, user_id)
+            )
+        else:
+            cursor.execute(
+                _UPDATE_FARM_STATE_SQL,
+                (new_xp, new_level, new_coins, now.isoformat(), action_data.farm_id, user_id)
+            )
+        cursor.execute(_UPSERT_RANKING_SQL, (user_id, new_xp, new_level))
+        conn.commit()
     
-    # Update challenge progress and get bonus rewards
-    bonus_xp, bonus_coins = update_challenge_progress(conn, current_user["id"], action_data.action)
+    return total_xp_earned, total_coins_earned, new_xp, new_coins, new_level
+
+
+@app.post("/farm/action", response_model=FarmActionResponse)
+async def perform_farm_action(
+    action_data: FarmActionRequest,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_auth_user)
+):
+    """Perform a farm action: plant, water, fertilize, harvest."""
+    total_xp_earned, total_coins_earned, new_xp, new_coins, new_level = await asyncio.to_thread(
+        _apply_farm_action, action_data, current_user["id"]
+    )
     
-    # Calculate new values
-    total_xp_earned = base_xp + bonus_xp
-    total_coins_earned = coins_change + bonus_coins
-    new_xp = current_xp + total_xp_earned
-    new_coins = current_coins + total_coins_earned
-    new_level = calculate_level(new_xp)
+    _challenges_cache.pop(current_user["id"], None)
     
-    # Check achievements
-    check_and_unlock_achievements(conn, current_user["id"], {
+    # Check achievements once the response is sent; it does not report unlocks
+    background_tasks.add_task(_unlock_achievements, current_user["id"], {
         "total_plants": None,  # Will fetch from stats if needed
         "level": new_level,
         "coins": new_coins
     })
     
-    # Update farm state
-    cursor.execute(
-        """UPDATE farm_state SET crops_json = ?, xp = ?, level = ?, coins = ?, last_updated = ?
-           WHERE farm_id = ? AND user_id = ?""",
-        (json.dumps(crops), new_xp, new_level, new_coins, datetime.now().isoformat(),
-         action_data.farm_id, current_user["id"])
-    )
-    conn.commit()
-    conn.close()
-    
     return FarmActionResponse(
         success=True,
         message=f"Action '{action_data.action}' performed successfully!",
@@ -746,11 +739,20 @@ async def perform_farm_action(
     )
 
 
+# User id -> built /challenges response. Endpoints that log care activity or
+# award rewards pop the user's entry; other workers may lag by at most the TTL.
+_challenges_cache: TTLCache = TTLCache(maxsize=4096, ttl=30)
+
+
 @app.get("/challenges")
-async def get_challenges(current_user: dict = Depends(get_current_user)):
+async def get_challenges(current_user: dict = Depends(get_current_auth_user)):
     """Get all challenges with user progress using real data."""
     from .database import get_db_session
     
+    cached = _challenges_cache.get(current_user["id"])
+    if cached is not None:
+        return cached
+    
     try:
         # Use SQLAlchemy session for better database handling
         db = get_db_session()
@@ -829,7 +831,7 @@ async def get_challenges(current_user: dict = Depends(get_current_user)):
         total_available_xp = sum(c.get("reward_xp", 0) for c in challenges_data["active_challenges"])
         total_available_coins = sum(c.get("reward_coins", 0) for c in challenges_data["active_challenges"])
         
-        return {
+        response = _challenges_cache[current_user["id"]] = {
             "success": True,
             "challenges": all_challenges,
             "summary": {
@@ -840,6 +842,7 @@ async def get_challenges(current_user: dict = Depends(get_current_user)):
                 "total_available_coins": total_available_coins
             }
         }
+        return response
         
     except Exception as e:
         print(f"Error in get_challenges endpoint: {e}")
@@ -849,7 +852,7 @@ async def get_challenges(current_user: dict = Depends(get_current_user)):
 @app.post("/challenges/{challenge_id}/complete")
 async def complete_challenge(
     challenge_id: str, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Complete a challenge and award rewards."""
     from .database import get_db_session
@@ -860,6 +863,7 @@ async def complete_challenge(
         
         # Attempt to complete the challenge
         result = challenges_service.complete_challenge(current_user["id"], challenge_id)
+        _challenges_cache.pop(current_user["id"], None)
         
         if not result["success"]:
             raise HTTPException(
@@ -884,7 +888,7 @@ async def complete_challenge(
 
 
 @app.get("/achievements", response_model=AchievementsSummaryResponse)
-async def get_achievements(current_user: dict = Depends(get_current_user)):
+async def get_achievements(current_user: dict = Depends(get_current_auth_user)):
     """Get all achievements with unlock status and progress."""
     try:
         achievements_service = AchievementsService()
@@ -918,7 +922,7 @@ async def get_achievements(current_user: dict = Depends(get_current_user)):
 
 
 @app.get("/achievements/stats")
-async def get_achievement_stats(current_user: dict = Depends(get_current_user)):
+async def get_achievement_stats(current_user: dict = Depends(get_current_auth_user)):
     """Get achievement statistics for user."""
     try:
         achievements_service = AchievementsService()
@@ -935,7 +939,7 @@ async def get_achievement_stats(current_user: dict = Depends(get_current_user)):
 
 
 @app.post("/achievements/check")
-async def check_achievements(current_user: dict = Depends(get_current_user)):
+async def check_achievements(current_user: dict = Depends(get_current_auth_user)):
     """Manually check for new achievement unlocks."""
     try:
         achievements_service = AchievementsService()
@@ -955,28 +959,27 @@ async def check_achievements(current_user: dict = Depends(get_current_user)):
 @app.get("/leaderboard", response_model=LeaderboardResponse)
 async def get_leaderboard(
     limit: int = Query(100, ge=1, le=1000),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Get leaderboard rankings."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get top users by XP
-    cursor.execute("""
-        SELECT u.id, u.username, COALESCE(f.level, 1) as level, COALESCE(f.xp, 0) as xp, 
-               COALESCE(s.total_harvests, 0) as harvests
-        FROM users u
-        LEFT JOIN (
-            SELECT user_id, MAX(level) as level, MAX(xp) as xp 
-            FROM farm_state 
-            GROUP BY user_id
-        ) f ON u.id = f.user_id
-        LEFT JOIN user_stats s ON u.id = s.user_id
-        ORDER BY xp DESC, level DESC
-        LIMIT ?
-    """, (limit,))
-    
-    rows = cursor.fetchall()
+    with db_pool.acquire() as conn:
+        rows = conn.execute("""
+            SELECT u.id, u.username, r.level, r.xp, COALESCE(s.total_harvests, 0) as harvests
+            FROM user_ranking r
+            JOIN users u ON u.id = r.user_id
+            LEFT JOIN user_stats s ON s.user_id = r.user_id
+            ORDER BY r.xp DESC, r.level DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+        if len(rows) < limit:
+            # Users without a farm yet rank last, at the starting level
+            rows += conn.execute("""
+                SELECT u.id, u.username, 1, 0, COALESCE(s.total_harvests, 0)
+                FROM users u
+                LEFT JOIN user_stats s ON s.user_id = u.id
+                WHERE NOT EXISTS (SELECT 1 FROM user_ranking r WHERE r.user_id = u.id)
+                LIMIT ?
+            """, (limit - len(rows),)).fetchall()
     
     entries = []
     user_rank = None
@@ -997,17 +1000,15 @@ async def get_leaderboard(
     
     # If user not in top, find their rank
     if user_rank is None:
-        cursor.execute("""
-            SELECT COUNT(*) + 1
-            FROM farm_state
-            WHERE xp > (SELECT COALESCE(MAX(xp), 0) FROM farm_state WHERE user_id = ?)
-        """, (current_user["id"],))
-        result = cursor.fetchone()
+        with db_pool.acquire() as conn:
+            result = conn.execute("""
+                SELECT COUNT(*) + 1
+                FROM user_ranking
+                WHERE xp > COALESCE((SELECT xp FROM user_ranking WHERE user_id = ?), 0)
+            """, (current_user["id"],)).fetchone()
         if result:
             user_rank = result[0]
     
-    conn.close()
-    
     return LeaderboardResponse(
         entries=entries,
         user_rank=user_rank
@@ -1016,254 +1017,278 @@ async def get_leaderboard(
 
 # Farm Management Endpoints
 @app.get("/farm/status")
-async def get_farm_status(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_farm_status(current_user: Dict[str, Any] = Depends(get_current_auth_user)):
     """Get the complete farm status for the current user."""
-    from .database import get_db_connection
+    # The crop math and its reads/writes are blocking, so they run on a worker thread
+    updated_crops, refresh = await asyncio.to_thread(_update_farm_status, current_user["id"])
     
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+    if refresh:
+        await _refresh_crop_scenarios(current_user["id"], refresh)
+    
+    return {"crops": updated_crops, "status": "success"}
+
+
+def _update_farm_status(user_id: int) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Advance the user's crops to now and store the changes.
+
+    Returns the crops for display, and those picked for a scenario refresh.
+    """
+    with db_pool.acquire() as conn:
+        rows = conn.execute("""
             SELECT id, name, position_row, position_col, planted_at, 
                    growth_stage, water_level, health, fertilizer_level,
-                   latitude, longitude, climate_bonus
+                   latitude, longitude, climate_bonus, planted_at_epoch
             FROM crops WHERE user_id = ?
-        """, (current_user["id"],))
-        
-        crops = []
-        for row in cursor.fetchall():
-            crops.append({
-                "id": row[0],
-                "name": row[1],
-                "position_row": row[2],
-                "position_col": row[3],
-                "planted_at": row[4],
-                "growth_stage": row[5],
-                "water_level": row[6],
-                "health": row[7],
-                "fertilizer_level": row[8] if row[8] is not None else 100,
-                "latitude": row[9],
-                "longitude": row[10],
-                "climate_bonus": row[11] if row[11] is not None else 0.0,
-            })
-        
-        # Update growth for all crops based on time and climate
-        current_time = datetime.now()
-        updated_crops = []
-        
-        # Natural plant degradation system - plants need ongoing care
-        for crop in crops:
-            plant_age_hours = (current_time - datetime.fromisoformat(crop["planted_at"].replace('Z', '+00:00').replace('+00:00', ''))).total_seconds() / 3600
-            
-            # Calculate degradation rates (per hour)
-            water_degradation_rate = 1.0  # Lose 1% water per hour
-            fertilizer_degradation_rate = 0.8  # Lose 0.8% fertilizer per hour  
-            health_degradation_rate = 0.3  # Lose 0.3% health per hour if water/fertilizer low
+        """, (user_id,)).fetchall()
+    
+    # Update growth for all crops based on time and climate
+    now = time.time()
+    crops = []
+    ages = {}  # crop id -> hours since planting
+    for row in rows:
+        planted_epoch = row[12]
+        if planted_epoch is None:
+            planted_epoch = datetime.fromisoformat(row[4].replace('Z', '+00:00').replace('+00:00', '')).timestamp()
+        ages[row[0]] = (now - planted_epoch) / 3600
+        crops.append({
+            "id": row[0],
+            "name": row[1],
+            "position_row": row[2],
+            "position_col": row[3],
+            "planted_at": row[4],
+            "growth_stage": row[5],
+            "water_level": row[6],
+            "health": row[7],
+            "fertilizer_level": row[8] if row[8] is not None else 100,
+            "latitude": row[9],
+            "longitude": row[10],
+            "climate_bonus": row[11] if row[11] is not None else 0.0,
+        })
+    
+    updated_crops = []
+    # Level and growth changes, written together in one transaction at the end
+    degraded = []
+    grown = []
+    
+    # Natural plant degradation system - plants need ongoing care
+    for crop in crops:
+        # Degradation is capped at one day's worth
+        decay_hours = min(ages[crop["id"]], 24)
+        
+        # Calculate degradation rates (per hour)
+        water_degradation_rate = 1.0  # Lose 1% water per hour
+        fertilizer_degradation_rate = 0.8  # Lose 0.8% fertilizer per hour  
+        health_degradation_rate = 0.3  # Lose 0.3% health per hour if water/fertilizer low
+        
+        # Apply natural degradation based on time since last care
+        current_water = crop["water_level"]
+        current_fertilizer = crop["fertilizer_level"] 
+        current_health = crop["health"]
+        
+        # Degrade water and fertilizer over time
+        new_water = max(0, current_water - (water_degradation_rate * decay_hours))
+        new_fertilizer = max(0, current_fertilizer - (fertilizer_degradation_rate * decay_hours))
+        
+        # Health degrades faster if water or fertilizer is low
+        if new_water < 30 or new_fertilizer < 30:
+            health_degradation_rate *= 2.0  # Double degradation if neglected
+        
+        new_health = max(10, current_health - (health_degradation_rate * decay_hours))
+        
+        # Update crop levels in database if they changed significantly
+        if abs(new_water - current_water) > 1 or abs(new_fertilizer - current_fertilizer) > 1 or abs(new_health - current_health) > 1:
+            degraded.append((new_water, new_fertilizer, new_health, crop["id"]))
             
-            # Apply natural degradation based on time since last care
-            current_water = crop["water_level"]
-            current_fertilizer = crop["fertilizer_level"] 
-            current_health = crop["health"]
+            # Update crop data
+            crop["water_level"] = new_water
+            crop["fertilizer_level"] = new_fertilizer  
+            crop["health"] = new_health
+    
+    scenarios_by_crop = ScenarioGenerator.get_active_scenarios_by_crop(user_id)
+    refresh = []  # crops to check against recent NASA data
+    for crop in crops:
+        # Check for active scenarios for this crop
+        active_scenarios = scenarios_by_crop.get(crop["id"], [])
+        crop["active_scenarios"] = len(active_scenarios)
+        crop["needs_attention"] = len(active_scenarios) > 0
+        crop["scenario_types"] = [s["scenario_type"] for s in active_scenarios]
+        
+        # Auto-generate scenarios if crop has location and none exist
+        if crop["latitude"] and crop["longitude"] and len(active_scenarios) == 0:
+            # Occasionally check for new scenarios (10% chance per status check)
+            if random.random() < 0.1:
+                refresh.append(crop)
+        
+        if crop["growth_stage"] < 100:
+            # Calculate time since planting
+            hours_passed = ages[crop["id"]]
             
-            # Degrade water and fertilizer over time
-            new_water = max(0, current_water - (water_degradation_rate * min(plant_age_hours, 24)))
-            new_fertilizer = max(0, current_fertilizer - (fertilizer_degradation_rate * min(plant_age_hours, 24)))
+            # Base growth rate (crops mature in ~4 hours)
+            base_growth_rate = 25.0  # 25% per hour = 100% in 4 hours
             
-            # Health degrades faster if water or fertilizer is low
-            if new_water < 30 or new_fertilizer < 30:
-                health_degradation_rate *= 2.0  # Double degradation if neglected
+            # Apply climate bonus
+            climate_multiplier = 1.0 + crop["climate_bonus"]
+            actual_growth_rate = base_growth_rate * climate_multiplier
             
-            new_health = max(10, current_health - (health_degradation_rate * min(plant_age_hours, 24)))
+            # Calculate new growth stage
+            new_growth = min(100, hours_passed * actual_growth_rate)
             
-            # Update crop levels in database if they changed significantly
-            if abs(new_water - current_water) > 1 or abs(new_fertilizer - current_fertilizer) > 1 or abs(new_health - current_health) > 1:
-                cursor.execute("""
-                    UPDATE crops 
-                    SET water_level = ?, fertilizer_level = ?, health = ?
-                    WHERE id = ?
-                """, (new_water, new_fertilizer, new_health, crop["id"]))
-                
-                # Update crop data
-                crop["water_level"] = new_water
-                crop["fertilizer_level"] = new_fertilizer  
-                crop["health"] = new_health
-        
-        for crop in crops:
-            # Check for active scenarios for this crop
-            active_scenarios = ScenarioGenerator.get_active_scenarios(current_user["id"], crop["id"])
-            crop["active_scenarios"] = len(active_scenarios)
-            crop["needs_attention"] = len(active_scenarios) > 0
-            crop["scenario_types"] = [s["scenario_type"] for s in active_scenarios]
-            
-            # Auto-generate scenarios if crop has location and none exist
-            if crop["latitude"] and crop["longitude"] and len(active_scenarios) == 0:
-                # Occasionally check for new scenarios (10% chance per status check)
-                if random.random() < 0.1:
-                    try:
-                        # Get recent NASA data
-                        nasa_client = NASAClient()
-                        end_date = datetime.now()
-                        start_date = end_date.replace(day=max(1, end_date.day - 3))
-                        
-                        query = FarmDataQuery(
-                            lat=crop["latitude"],
-                            lon=crop["longitude"],
-                            start=start_date.strftime('%Y%m%d'),
-                            end=end_date.strftime('%Y%m%d'),
-                            crop_type=crop["name"]
-                        )
-                        
-                        nasa_data = await nasa_client.get_farm_data(query)
-                        location_info = {"latitude": crop["latitude"], "longitude": crop["longitude"]}
-                        scenarios = await ScenarioGenerator.analyze_nasa_data_for_scenarios(nasa_data, crop, location_info)
-                        
-                        # Save new scenarios
-                        for scenario_data in scenarios:
-                            ScenarioGenerator.save_scenario_to_db(current_user["id"], crop["id"], scenario_data)
-                        
-                        if scenarios:
-                            crop["active_scenarios"] = len(scenarios)
-                            crop["needs_attention"] = True
-                            crop["scenario_types"] = [s["scenario_type"] for s in scenarios]
-                    
-                    except Exception as e:
-                        print(f"Failed to auto-generate scenarios: {e}")
-            
-            if crop["growth_stage"] < 100:
-                # Calculate time since planting
-                planted_at = datetime.fromisoformat(crop["planted_at"].replace('Z', '+00:00').replace('+00:00', ''))
-                hours_passed = (current_time - planted_at).total_seconds() / 3600
-                
-                # Base growth rate (crops mature in ~4 hours)
-                base_growth_rate = 25.0  # 25% per hour = 100% in 4 hours
+            if new_growth != crop["growth_stage"]:
+                grown.append((new_growth, crop["id"]))
+                crop["growth_stage"] = new_growth
                 
-                # Apply climate bonus
-                climate_multiplier = 1.0 + crop["climate_bonus"]
-                actual_growth_rate = base_growth_rate * climate_multiplier
-                
-                # Calculate new growth stage
-                new_growth = min(100, hours_passed * actual_growth_rate)
-                
-                if new_growth != crop["growth_stage"]:
-                    # Update growth in database
-                    cursor.execute("""
-                        UPDATE crops SET growth_stage = ? WHERE id = ?
-                    """, (new_growth, crop["id"]))
-                    crop["growth_stage"] = new_growth
-                    
-            updated_crops.append(crop)
-        
-        conn.commit()
-        
-        return {"crops": updated_crops, "status": "success"}
-
-@app.post("/farm/plant")
-async def plant_crop(
-    request: dict,
-    current_user: Dict[str, Any] = Depends(get_current_user),
-    nasa_client: NASAClient = Depends(get_nasa_client)
-):
-    """Plant a crop at the specified position with location-based climate data."""
-    from .database import get_db_connection
-    
-    position_row = request.get("position_row")
-    position_col = request.get("position_col") 
-    crop_type = request.get("crop_type")
-    latitude = request.get("latitude")
-    longitude = request.get("longitude")
+        updated_crops.append(crop)
     
-    if position_row is None or position_col is None or not crop_type:
-        raise HTTPException(status_code=400, detail="Missing required fields")
-    
-    if latitude is None or longitude is None:
-        raise HTTPException(status_code=400, detail="Location is required for planting. Please select a farm location first.")
-    
-    # Crop costs mapping
-    crop_costs = {
-        "Tomato": 10, "Wheat": 5, "Corn": 15,
-        "Carrot": 8, "Potato": 12, "Lettuce": 6
-    }
+    if degraded or grown:
+        with write_connection() as conn, conn:
+            conn.executemany(
+                "UPDATE crops SET water_level = ?, fertilizer_level = ?, health = ? WHERE id = ?",
+                degraded,
+            )
+            conn.executemany("UPDATE crops SET growth_stage = ? WHERE id = ?", grown)
     
-    cost = crop_costs.get(crop_type, 10)
+    return updated_crops, refresh
+
+
+async def _refresh_crop_scenarios(user_id: int, crops: List[Dict[str, Any]]) -> None:
+    """Generate scenarios for ``crops`` from recent NASA data and flag the crops in place.
+
+    The NASA fetches and the scenario analyses each run concurrently; one
+    crop failing does not stop the others.
+    """
+    nasa_client = await get_nasa_client()
+    nasa_results = await asyncio.gather(
+        *(_recent_climate(nasa_client, crop["latitude"], crop["longitude"]) for crop in crops),
+        return_exceptions=True,
+    )
     
-    # Check if user has enough coins
-    if current_user.get("coins", 0) < cost:
-        raise HTTPException(status_code=400, detail="Insufficient coins")
+    fetched = []
+    for crop, result in zip(crops, nasa_results):
+        if isinstance(result, Exception):
+            print(f"Failed to auto-generate scenarios: {result}")
+        elif result[0] is not None:
+            fetched.append((crop, result[0]))
+    
+    analyses = await asyncio.gather(
+        *(
+            ScenarioGenerator.analyze_nasa_data_for_scenarios(
+                nasa_data, crop, {"latitude": crop["latitude"], "longitude": crop["longitude"]}
+            )
+            for crop, nasa_data in fetched
+        ),
+        return_exceptions=True,
+    )
     
-    # Get NASA climate data for the location
-    try:
-        nasa_data = nasa_client.get_farm_data(latitude, longitude)
-        
-        # Calculate climate bonus based on NASA data
-        climate_bonus = 0.0
-        if nasa_data and "properties" in nasa_data:
-            props = nasa_data["properties"]["parameter"]
-            
-            # Temperature bonus (optimal 20-30°C)
-            if "T2M" in props:
-                temp = props["T2M"]
-                if isinstance(temp, dict) and temp:
-                    avg_temp = sum(temp.values()) / len(temp)
-                    if 20 <= avg_temp <= 30:
-                        climate_bonus += 0.2
-                    elif 15 <= avg_temp <= 35:
-                        climate_bonus += 0.1
-            
-            # Precipitation bonus (optimal 2-5mm/day)
-            if "PRECTOTCORR" in props:
-                precip = props["PRECTOTCORR"]
-                if isinstance(precip, dict) and precip:
-                    avg_precip = sum(precip.values()) / len(precip)
-                    if 2 <= avg_precip <= 5:
-                        climate_bonus += 0.15
-                    elif 1 <= avg_precip <= 7:
-                        climate_bonus += 0.05
-            
-            # Solar radiation bonus (optimal >15 kWh/m²)
-            if "ALLSKY_SFC_SW_DWN" in props:
-                solar = props["ALLSKY_SFC_SW_DWN"]
-                if isinstance(solar, dict) and solar:
-                    avg_solar = sum(solar.values()) / len(solar)
-                    if avg_solar > 15:
-                        climate_bonus += 0.1
-                    elif avg_solar > 10:
-                        climate_bonus += 0.05
-    except Exception as e:
-        # Don't fail planting due to NASA API issues, just use no bonus
-        print(f"NASA API error during planting: {e}")
-        climate_bonus = 0.0
+    new_scenarios = []
+    for (crop, _), scenarios in zip(fetched, analyses):
+        if isinstance(scenarios, Exception):
+            print(f"Failed to auto-generate scenarios: {scenarios}")
+            continue
+        if scenarios:
+            new_scenarios.extend((crop["id"], scenario_data) for scenario_data in scenarios)
+            crop["active_scenarios"] = len(scenarios)
+            crop["needs_attention"] = True
+            crop["scenario_types"] = [s["scenario_type"] for s in scenarios]
     
-    with get_db_connection() as conn:
+    if new_scenarios:
+        try:
+            await asyncio.to_thread(ScenarioGenerator.save_scenarios_to_db, user_id, new_scenarios)
+        except Exception as e:
+            print(f"Failed to auto-generate scenarios: {e}")
+
+# Recent NASA data and its climate bonus per ~1 km cell and day, so a row of
+# plantings on one farm shares a single fetch. Failed fetches are not cached.
+_climate_cache: TTLCache = TTLCache(maxsize=4096, ttl=24 * 3600)
+
+
+def _mean(values: Any) -> float | None:
+    """Average of a NASA {date: value} series, or None if it is missing or empty."""
+    if isinstance(values, dict) and values:
+        return sum(values.values()) / len(values)
+    return None
+
+
+def _climate_bonus(props: Dict[str, Any]) -> float:
+    """Growth bonus for a location's recent NASA parameter data."""
+    climate_bonus = 0.0
+    
+    # Temperature bonus (optimal 20-30°C)
+    avg_temp = _mean(props.get("T2M"))
+    if avg_temp is not None:
+        if 20 <= avg_temp <= 30:
+            climate_bonus += 0.2
+        elif 15 <= avg_temp <= 35:
+            climate_bonus += 0.1
+    
+    # Precipitation bonus (optimal 2-5mm/day)
+    avg_precip = _mean(props.get("PRECTOTCORR"))
+    if avg_precip is not None:
+        if 2 <= avg_precip <= 5:
+            climate_bonus += 0.15
+        elif 1 <= avg_precip <= 7:
+            climate_bonus += 0.05
+    
+    # Solar radiation bonus (optimal >15 kWh/m²)
+    avg_solar = _mean(props.get("ALLSKY_SFC_SW_DWN"))
+    if avg_solar is not None:
+        if avg_solar > 15:
+            climate_bonus += 0.1
+        elif avg_solar > 10:
+            climate_bonus += 0.05
+    
+    return climate_bonus
+
+
+async def _recent_climate(
+    nasa_client: NASAClient, latitude: float, longitude: float
+) -> tuple[dict | None, float]:
+    """NASAClient.get_recent_farm_data() and its climate bonus, through _climate_cache."""
+    key = (round(latitude, 2), round(longitude, 2), date.today())
+    cached = _climate_cache.get(key)
+    if cached is None:
+        nasa_data = await nasa_client.get_recent_farm_data(latitude, longitude)
+        if nasa_data is None:
+            return None, 0.0
+        cached = _climate_cache[key] = (nasa_data, _climate_bonus(nasa_data["properties"]["parameter"]))
+    return cached
+
+
+def _insert_crop(
+    user_id: int, crop_type: str, position_row: int, position_col: int,
+    latitude: float, longitude: float, climate_bonus: float,
+    planted_at: datetime, new_coins: int, nasa_data: Dict[str, Any] | None,
+) -> int:
+    """Plant a crop and charge for it on the writer connection; run via asyncio.to_thread.
+
+    Returns the new crop's id.
+    """
+    with write_connection() as conn:
         cursor = conn.cursor()
         
-        # Check if position is already occupied
-        cursor.execute("""
-            SELECT id FROM crops 
-            WHERE user_id = ? AND position_row = ? AND position_col = ?
-        """, (current_user["id"], position_row, position_col))
-        
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Position already occupied")
-        
         # Create new crop with location and realistic starting conditions
-        # New plants start with moderate levels and need care to thrive
+        # New plants start with moderate levels and need care to thrive.
+        # UNIQUE(user_id, position_row, position_col) rejects occupied spots.
         cursor.execute("""
             INSERT INTO crops (user_id, name, position_row, position_col, planted_at, 
                              growth_stage, water_level, health, fertilizer_level,
-                             latitude, longitude, climate_bonus)
-            VALUES (?, ?, ?, ?, ?, 0, 60, 75, 40, ?, ?, ?)
-        """, (current_user["id"], crop_type, position_row, position_col, datetime.now(),
-              latitude, longitude, climate_bonus))
+                             latitude, longitude, climate_bonus, planted_at_epoch)
+            VALUES (?, ?, ?, ?, ?, 0, 60, 75, 40, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        """, (user_id, crop_type, position_row, position_col, planted_at,
+              latitude, longitude, climate_bonus, int(planted_at.timestamp())))
+        
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=400, detail="Position already occupied")
         
         crop_id = cursor.lastrowid
         
         # Deduct coins from user
-        new_coins = current_user["coins"] - cost
-        cursor.execute("UPDATE users SET coins = ? WHERE id = ?", (new_coins, current_user["id"]))
+        cursor.execute("UPDATE users SET coins = ? WHERE id = ?", (new_coins, user_id))
         
         # Store NASA data in database to avoid repeated API calls
         if nasa_data and "properties" in nasa_data:
             try:
-                import json
+                from .database import pack_json
                 nasa_params = nasa_data["properties"]["parameter"]
                 cursor.execute("""
                     INSERT OR REPLACE INTO nasa_data (crop_id, latitude, longitude, 
@@ -1272,11 +1297,11 @@ async def plant_crop(
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
                     crop_id, latitude, longitude,
-                    json.dumps(nasa_params.get("T2M", {})), 
-                    json.dumps(nasa_params.get("PRECTOTCORR", {})),
-                    json.dumps(nasa_params.get("ALLSKY_SFC_SW_DWN", {})),
-                    json.dumps(nasa_params.get("RH2M", {})),
-                    json.dumps(nasa_params.get("WS2M", {})),
+                    pack_json(nasa_params.get("T2M", {})), 
+                    pack_json(nasa_params.get("PRECTOTCORR", {})),
+                    pack_json(nasa_params.get("ALLSKY_SFC_SW_DWN", {})),
+                    pack_json(nasa_params.get("RH2M", {})),
+                    pack_json(nasa_params.get("WS2M", {})),
                     datetime.now()
                 ))
                 print(f"Stored NASA data for crop {crop_id}")
@@ -1284,126 +1309,263 @@ async def plant_crop(
                 print(f"Failed to store NASA data: {e}")
         
         conn.commit()
-        
-        # Generate initial scenarios for the newly planted crop
-        try:
-            crop_dict = {
-                "id": crop_id,
-                "user_id": current_user["id"], 
-                "name": crop_type,
-                "latitude": latitude,
-                "longitude": longitude,
-                "growth_stage": 0,
-                "health": 100,
-                "water_level": 100,
-                "fertilizer_level": 100,
-                "planted_at": datetime.now()
-            }
-            
-            if nasa_data:
-                # Generate scenarios using NASA data
-                location_info = {"latitude": latitude, "longitude": longitude}
-                scenarios = await ScenarioGenerator.analyze_nasa_data_for_scenarios(nasa_data, crop_dict, location_info)
-                print(f"Generated {len(scenarios)} initial scenarios for crop {crop_id}")
-        except Exception as e:
-            print(f"Failed to generate initial scenarios: {e}")
-            # Don't fail the planting if scenario generation fails
-        
-        # Trigger educational content update since user added new plant
-        try:
-            from .educational_manager import educational_manager
-            await educational_manager.invalidate_user_content(current_user["id"])
-            print(f"🎓 Educational content invalidated for user {current_user['id']} due to new plant")
-        except Exception as e:
-            print(f"Warning: Failed to update educational content: {e}")
-        
-        # Log activity for challenges tracking
-        try:
-            from .database import get_db_session
-            activity_db = get_db_session()
-            log_activity(activity_db, current_user["id"], "plant", crop_id, xp_earned=20, coins_earned=0)
-            
-            # Check for newly completable challenges
-            completable = check_completable_challenges(activity_db, current_user["id"])
-            if completable:
-                print(f"🎯 User {current_user['id']} has {len(completable)} completable challenges after planting!")
-            
-            activity_db.close()
-        except Exception as e:
-            print(f"Warning: Failed to log planting activity: {e}")
-        
-        return {
-            "crop_id": crop_id,
-            "cost": cost,
-            "growth_stage": 0,
-            "climate_bonus": climate_bonus,
-            "location": {"latitude": latitude, "longitude": longitude},
-            "water_level": 60,  # Realistic starting value
-            "health": 75,      # Realistic starting value
-            "fertilizer_level": 40,  # Realistic starting value
-            "rewards": {"xp": 20, "coins": 0},  # Updated to match logged activity
-            "status": "success",
-            "message": "Crop planted successfully! New educational content will be generated based on your expanded farm."
-        }
+    
+    return crop_id
 
-@app.post("/farm/water/{crop_id}")
-async def water_crop(
-    crop_id: int,
-    quality_level: str = "basic",  # basic (5 coins), premium (12 coins), expert (20 coins)
-    current_user: Dict[str, Any] = Depends(get_current_user)
+
+@app.post("/farm/plant")
+async def plant_crop(
+    request: dict,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    nasa_client: NASAClient = Depends(get_nasa_client)
 ):
-    """Water a specific crop with realistic costs and quality scoring."""
-    from .database import get_db_connection
+    """Plant a crop at the specified position with location-based climate data."""
+    position_row = request.get("position_row")
+    position_col = request.get("position_col") 
+    crop_type = request.get("crop_type")
+    latitude = request.get("latitude")
+    longitude = request.get("longitude")
+    
+    if position_row is None or position_col is None or not crop_type:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    
+    if latitude is None or longitude is None:
+        raise HTTPException(status_code=400, detail="Location is required for planting. Please select a farm location first.")
     
-    # Water quality costs and benefits
-    water_options = {
-        "basic": {"cost": 5, "water_boost": 25, "health_boost": 3, "quality_score": 60},
-        "premium": {"cost": 12, "water_boost": 40, "health_boost": 8, "quality_score": 80},
-        "expert": {"cost": 20, "water_boost": 50, "health_boost": 15, "quality_score": 95}
+    # Crop costs mapping
+    crop_costs = {
+        "Tomato": 10, "Wheat": 5, "Corn": 15,
+        "Carrot": 8, "Potato": 12, "Lettuce": 6
     }
     
-    if quality_level not in water_options:
-        quality_level = "basic"
-    
-    water_config = water_options[quality_level]
+    cost = crop_costs.get(crop_type, 10)
     
     # Check if user has enough coins
-    if current_user.get("coins", 0) < water_config["cost"]:
-        raise HTTPException(status_code=400, detail=f"Insufficient coins for {quality_level} watering (need {water_config['cost']} coins)")
+    if current_user.get("coins", 0) < cost:
+        raise HTTPException(status_code=400, detail="Insufficient coins")
     
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+    # Get NASA climate data for the location
+    try:
+        nasa_data, climate_bonus = await _recent_climate(nasa_client, latitude, longitude)
+    except Exception as e:
+        # Don't fail planting due to NASA API issues, just use no bonus
+        print(f"NASA API error during planting: {e}")
+        nasa_data, climate_bonus = None, 0.0
+    
+    planted_at = datetime.now()
+    crop_id = await asyncio.to_thread(
+        _insert_crop, current_user["id"], crop_type, position_row, position_col,
+        latitude, longitude, climate_bonus, planted_at, current_user["coins"] - cost, nasa_data,
+    )
+    
+    # Generate initial scenarios for the newly planted crop
+    try:
+        crop_dict = {
+            "id": crop_id,
+            "user_id": current_user["id"], 
+            "name": crop_type,
+            "latitude": latitude,
+            "longitude": longitude,
+            "growth_stage": 0,
+            "health": 100,
+            "water_level": 100,
+            "fertilizer_level": 100,
+            "planted_at": datetime.now()
+        }
         
-        # Get crop details including care history
-        cursor.execute("""
-            SELECT id, water_level, health, fertilizer_level, 
-                   total_investment, care_score, last_watered
-            FROM crops 
-            WHERE id = ? AND user_id = ?
-        """, (crop_id, current_user["id"]))
+        if nasa_data:
+            # Generate scenarios using NASA data
+            location_info = {"latitude": latitude, "longitude": longitude}
+            scenarios = await ScenarioGenerator.analyze_nasa_data_for_scenarios(nasa_data, crop_dict, location_info)
+            print(f"Generated {len(scenarios)} initial scenarios for crop {crop_id}")
+    except Exception as e:
+        print(f"Failed to generate initial scenarios: {e}")
+        # Don't fail the planting if scenario generation fails
+    
+    # Trigger educational content update since user added new plant
+    try:
+        from .educational_manager import educational_manager
+        await educational_manager.invalidate_user_content(current_user["id"])
+        print(f"🎓 Educational content invalidated for user {current_user['id']} due to new plant")
+    except Exception as e:
+        print(f"Warning: Failed to update educational content: {e}")
+    
+    # Log activity for challenges tracking
+    try:
+        from .database import get_db_session
+        activity_db = get_db_session()
+        log_activity(activity_db, current_user["id"], "plant", crop_id, xp_earned=20, coins_earned=0)
         
-        crop = cursor.fetchone()
+        # Check for newly completable challenges
+        completable = check_completable_challenges(activity_db, current_user["id"])
+        if completable:
+            print(f"🎯 User {current_user['id']} has {len(completable)} completable challenges after planting!")
+        
+        activity_db.close()
+    except Exception as e:
+        print(f"Warning: Failed to log planting activity: {e}")
+    _challenges_cache.pop(current_user["id"], None)
+    
+    return {
+        "crop_id": crop_id,
+        "cost": cost,
+        "growth_stage": 0,
+        "climate_bonus": climate_bonus,
+        "location": {"latitude": latitude, "longitude": longitude},
+        "water_level": 60,  # Realistic starting value
+        "health": 75,      # Realistic starting value
+        "fertilizer_level": 40,  # Realistic starting value
+        "rewards": {"xp": 20, "coins": 0},  # Updated to match logged activity
+        "status": "success",
+        "message": "Crop planted successfully! New educational content will be generated based on your expanded farm."
+    }
+
+# Water quality costs and benefits
+_WATER_OPTIONS = {
+    "basic": {"cost": 5, "water_boost": 25, "health_boost": 3, "quality_score": 60},
+    "premium": {"cost": 12, "water_boost": 40, "health_boost": 8, "quality_score": 80},
+    "expert": {"cost": 20, "water_boost": 50, "health_boost": 15, "quality_score": 95}
+}
+
+# Fertilizer types with different costs and benefits
+_FERTILIZER_OPTIONS = {
+    "basic": {
+        "cost": 15, "nutrient_boost": 30, "health_boost": 8, "growth_bonus": 1.2,
+        "quality_score": 65, "duration": 7, "name": "Basic NPK Fertilizer"
+    },
+    "organic": {
+        "cost": 25, "nutrient_boost": 45, "health_boost": 15, "growth_bonus": 1.5,
+        "quality_score": 85, "duration": 12, "name": "Organic Compost Blend"
+    },
+    "premium": {
+        "cost": 40, "nutrient_boost": 60, "health_boost": 25, "growth_bonus": 2.0,
+        "quality_score": 95, "duration": 18, "name": "Expert Slow-Release Formula"
+    }
+}
+
+# Care actions write the crop, the user's wallet and the care log in one
+# BEGIN IMMEDIATE transaction, so each request commits once. The care
+# endpoints use pooled connections or the shared writer, whose statement
+# caches outlive a request, so each text below is prepared once per connection.
+
+# Watering clamps the levels and blends the care score in SQL from the stored
+# values (0 or NULL levels count as the defaults, as they did in Python);
+# params: water boost, health boost, cost, quality score, crop id, user id
+_WATER_CROP_SQL = """
+    UPDATE crops SET 
+        water_level = MIN(100, COALESCE(NULLIF(water_level, 0), 50) + ?),
+        health = MIN(100, COALESCE(NULLIF(health, 0), 50) + ?),
+        total_investment = COALESCE(total_investment, 0) + ?,
+        care_score = COALESCE(NULLIF(care_score, 0), 60.0) * 0.8
+            + ? * MAX(0.5, (100 - COALESCE(NULLIF(water_level, 0), 50)) / 100.0) * 0.2,
+        last_watered = CURRENT_TIMESTAMP
+    WHERE id = ? AND user_id = ?
+"""
+_WATERED_COLS = "water_level, health, care_score, total_investment"
+_WATER_CROP_RETURNING_SQL = f"{_WATER_CROP_SQL} RETURNING {_WATERED_COLS}"
+_FERTILIZE_CROP_SQL = """
+    UPDATE crops SET 
+        fertilizer_level = ?, health = ?, total_investment = ?,
+        care_score = ?, last_fertilized = CURRENT_TIMESTAMP
+    WHERE id = ?
+"""
+# Wallet changes are applied as deltas, so concurrent requests for the same
+# user cannot overwrite each other with totals read before they started
+_ADD_TO_WALLET_SQL = "UPDATE users SET coins = COALESCE(coins, 0) + ?, xp = COALESCE(xp, 0) + ? WHERE id = ?"
+_LOG_CARE_SQL = """
+    INSERT OR REPLACE INTO crop_care_log 
+    (crop_id, user_id, action_type, quality_level, cost_paid, efficiency_score, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+_HARVEST_CROP_SQL = """
+    SELECT id, growth_stage, health, name FROM crops 
+    WHERE id = ? AND user_id = ?
+"""
+_DELETE_CROP_SQL = "DELETE FROM crops WHERE id = ?"
+# The scorecard counts the crop's care actions in the same query; the count
+# stays capped at the 20 most recent actions the scores were designed around
+_SCORECARD_CROP_SQL = """
+    SELECT c.id, c.name, c.water_level, c.health, c.fertilizer_level, c.growth_stage,
+           c.total_investment, c.care_score, c.planted_at, c.last_watered, c.last_fertilized,
+           MIN(20, (SELECT COUNT(*) FROM crop_care_log l
+                    WHERE l.crop_id = c.id AND l.user_id = c.user_id)) AS care_actions
+    FROM crops c
+    WHERE c.id = ? AND c.user_id = ?
+"""
+# Claiming care rewards stamps the crop and reads back its performance data
+_MARK_CARE_REWARD_SQL = """
+    UPDATE crops SET last_reward_calculated = CURRENT_TIMESTAMP
+    WHERE id = ? AND user_id = ?
+"""
+# RETURNING hands back REAL values stored as integers unconverted, so cast them
+_CARE_REWARD_COLS = (
+    "CAST(care_score AS REAL), total_investment, CAST(growth_stage AS REAL), "
+    "CAST(health AS REAL), planted_at"
+)
+_MARK_CARE_REWARD_RETURNING_SQL = f"{_MARK_CARE_REWARD_SQL} RETURNING {_CARE_REWARD_COLS}"
+
+# Farmer tiers as (care score threshold, icon, name, care reward bonus),
+# highest first; scores below every threshold get _DEFAULT_FARMER_TIER
+_FARMER_TIERS = (
+    (95, "🏆", "Legendary Farmer", 50),
+    (85, "🌟", "Master Grower", 30),
+    (75, "🎯", "Expert Caretaker", 20),
+    (65, "🌱", "Good Farmer", 10),
+)
+_DEFAULT_FARMER_TIER = ("📚", "Learning Farmer", 5)
+
+# The leaderboard reads the trigger-kept user_care_summary and labels each
+# row's tier in SQL with the same thresholds
+_CARE_LEADERBOARD_SQL = """
+    SELECT u.username, u.id, s.avg_care_score, s.total_crops, s.total_invested, s.best_score,
+           CASE %s ELSE '%s' END as tier
+    FROM user_care_summary s
+    JOIN users u ON u.id = s.user_id
+    ORDER BY s.avg_care_score DESC, s.best_score DESC
+    LIMIT 20
+""" % (
+    " ".join(
+        f"WHEN s.avg_care_score >= {threshold} THEN '{icon} {name}'"
+        for threshold, icon, name, _ in _FARMER_TIERS
+    ),
+    "%s %s" % _DEFAULT_FARMER_TIER[:2],
+)
+
+
+def _water_crop(crop_id: int, user_id: int, quality_level: str) -> Dict[str, Any]:
+    """Apply a watering in one writer transaction; run via asyncio.to_thread."""
+    water_config = _WATER_OPTIONS[quality_level]
+    
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Water the crop and read back its new levels in one statement
+        params = (
+            water_config["water_boost"], water_config["health_boost"], water_config["cost"],
+            water_config["quality_score"], crop_id, user_id
+        )
+        if HAS_RETURNING:
+            crop = cursor.execute(_WATER_CROP_RETURNING_SQL, params).fetchone()
+        elif cursor.execute(_WATER_CROP_SQL, params).rowcount:
+            crop = cursor.execute(f"SELECT {_WATERED_COLS} FROM crops WHERE id = ?", (crop_id,)).fetchone()
+        else:
+            crop = None
         if not crop:
             raise HTTPException(status_code=404, detail="Crop not found")
         
-        # Calculate care quality based on timing and current plant state
-        current_water = crop[1] or 50
-        current_health = crop[2] or 50
-        current_investment = crop[4] or 0
-        current_care_score = crop[5] or 60.0
+        new_water_level, new_health, new_care_score, new_investment = crop
+        
+        # Levels before watering; where the boost was clamped at 100 these
+        # overshoot, but the need factor below and the health check stay the same
+        current_water = new_water_level - water_config["water_boost"]
+        current_health = new_health - water_config["health_boost"]
+        current_investment = new_investment - water_config["cost"]
         
         # Determine watering efficiency (better when plant really needs water)
         water_need_factor = max(0.5, (100 - current_water) / 100)
         efficiency_score = water_config["quality_score"] * water_need_factor
         
-        # Update plant levels
-        new_water_level = min(100, current_water + water_config["water_boost"])
-        new_health = min(100, current_health + water_config["health_boost"])
-        new_investment = current_investment + water_config["cost"]
-        
-        # Calculate updated care score (weighted average)
-        new_care_score = (current_care_score * 0.8) + (efficiency_score * 0.2)
-        
         # Determine rewards based on care quality
         base_xp = 8
         base_coins = 0  # No coins earned, this costs money
@@ -1420,39 +1582,26 @@ async def water_crop(
         
         total_xp = base_xp + bonus_xp
         
-        # Update crop in database
-        cursor.execute("""
-            UPDATE crops SET 
-                water_level = ?, health = ?, total_investment = ?, 
-                care_score = ?, last_watered = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (new_water_level, new_health, new_investment, new_care_score, crop_id))
-        
         # Update user coins and XP
-        new_coins = current_user["coins"] - water_config["cost"]
-        new_xp = current_user.get("xp", 0) + total_xp
-        cursor.execute("UPDATE users SET coins = ?, xp = ? WHERE id = ?", 
-                      (new_coins, new_xp, current_user["id"]))
+        cursor.execute(_ADD_TO_WALLET_SQL, (-water_config["cost"], total_xp, user_id))
         
         # Track care action for scoring
-        cursor.execute("""
-            INSERT OR REPLACE INTO crop_care_log 
-            (crop_id, user_id, action_type, quality_level, cost_paid, efficiency_score, created_at)
-            VALUES (?, ?, 'water', ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (crop_id, current_user["id"], quality_level, water_config["cost"], efficiency_score))
-        
-        conn.commit()
+        cursor.execute(_LOG_CARE_SQL, (
+            crop_id, user_id, "water", quality_level, water_config["cost"], efficiency_score
+        ))
         
-        # Log activity and check for challenge completions
-        from .activity_tracker import log_activity
+        # Record the activity; achievements are checked once this commits
         log_activity(
-            user_id=current_user["id"],
+            user_id=user_id,
             action_type="water", 
             xp_earned=total_xp,
             coins_earned=0,
-            db_connection=conn
+            db_connection=conn,
+            check_achievements=False
         )
         
+        conn.commit()
+        
         # Generate care recommendations
         recommendations = []
         if new_water_level > 90:
@@ -1476,22 +1625,38 @@ async def water_crop(
             "status": "success"
         }
 
-@app.post("/farm/harvest/{crop_id}")
-async def harvest_crop(
+
+@app.post("/farm/water/{crop_id}")
+async def water_crop(
     crop_id: int,
+    background_tasks: BackgroundTasks,
+    quality_level: str = "basic",  # basic (5 coins), premium (12 coins), expert (20 coins)
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Harvest a mature crop."""
-    from .database import get_db_connection
+    """Water a specific crop with realistic costs and quality scoring."""
+    if quality_level not in _WATER_OPTIONS:
+        quality_level = "basic"
     
-    with get_db_connection() as conn:
+    water_config = _WATER_OPTIONS[quality_level]
+    
+    # Check if user has enough coins
+    if current_user.get("coins", 0) < water_config["cost"]:
+        raise HTTPException(status_code=400, detail=f"Insufficient coins for {quality_level} watering (need {water_config['cost']} coins)")
+    
+    response = await asyncio.to_thread(_water_crop, crop_id, current_user["id"], quality_level)
+    _challenges_cache.pop(current_user["id"], None)
+    background_tasks.add_task(check_achievements_for_user, current_user["id"], None)
+    return response
+
+
+def _harvest_crop(crop_id: int, user_id: int) -> Dict[str, Any]:
+    """Harvest a crop in one writer transaction; run via asyncio.to_thread."""
+    with write_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
         
         # Get crop details
-        cursor.execute("""
-            SELECT id, growth_stage, health, name FROM crops 
-            WHERE id = ? AND user_id = ?
-        """, (crop_id, current_user["id"]))
+        cursor.execute(_HARVEST_CROP_SQL, (crop_id, user_id))
         
         crop = cursor.fetchone()
         if not crop:
@@ -1507,22 +1672,19 @@ async def harvest_crop(
         total_coins = (base_reward * 2) + (health_bonus * 2)
         
         # Remove crop from database
-        cursor.execute("DELETE FROM crops WHERE id = ?", (crop_id,))
+        cursor.execute(_DELETE_CROP_SQL, (crop_id,))
         
         # Add rewards to user
-        new_coins = current_user["coins"] + total_coins
-        new_xp = current_user.get("xp", 0) + total_xp
-        cursor.execute("UPDATE users SET coins = ?, xp = ? WHERE id = ?", 
-                      (new_coins, new_xp, current_user["id"]))
+        cursor.execute(_ADD_TO_WALLET_SQL, (total_coins, total_xp, user_id))
         
-        # Log activity and check for challenge completions
-        from .activity_tracker import log_activity
+        # Record the activity; achievements are checked once this commits
         log_activity(
-            user_id=current_user["id"],
+            user_id=user_id,
             action_type="harvest", 
             xp_earned=total_xp,
             coins_earned=total_coins,
-            db_connection=conn
+            db_connection=conn,
+            check_achievements=False
         )
         
         conn.commit()
@@ -1534,45 +1696,27 @@ async def harvest_crop(
             "status": "success"
         }
 
-@app.post("/farm/fertilize/{crop_id}")
-async def fertilize_crop(
+
+@app.post("/farm/harvest/{crop_id}")
+async def harvest_crop(
     crop_id: int,
-    fertilizer_type: str = "basic",  # basic (15 coins), organic (25 coins), premium (40 coins)
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Fertilize a crop with realistic costs and advanced plant nutrition science."""
-    from .database import get_db_connection
-    
-    # Fertilizer types with different costs and benefits
-    fertilizer_options = {
-        "basic": {
-            "cost": 15, "nutrient_boost": 30, "health_boost": 8, "growth_bonus": 1.2,
-            "quality_score": 65, "duration": 7, "name": "Basic NPK Fertilizer"
-        },
-        "organic": {
-            "cost": 25, "nutrient_boost": 45, "health_boost": 15, "growth_bonus": 1.5,
-            "quality_score": 85, "duration": 12, "name": "Organic Compost Blend"
-        },
-        "premium": {
-            "cost": 40, "nutrient_boost": 60, "health_boost": 25, "growth_bonus": 2.0,
-            "quality_score": 95, "duration": 18, "name": "Expert Slow-Release Formula"
-        }
-    }
-    
-    if fertilizer_type not in fertilizer_options:
-        fertilizer_type = "basic"
-    
-    fertilizer_config = fertilizer_options[fertilizer_type]
-    
-    # Check if user has enough coins
-    if current_user.get("coins", 0) < fertilizer_config["cost"]:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Insufficient coins for {fertilizer_config['name']} (need {fertilizer_config['cost']} coins)"
-        )
+    """Harvest a mature crop."""
+    response = await asyncio.to_thread(_harvest_crop, crop_id, current_user["id"])
+    _challenges_cache.pop(current_user["id"], None)
+    background_tasks.add_task(check_achievements_for_user, current_user["id"], None)
+    return response
+
+
+def _fertilize_crop(crop_id: int, user_id: int, fertilizer_type: str) -> Dict[str, Any]:
+    """Apply a fertilizer in one writer transaction; run via asyncio.to_thread."""
+    fertilizer_config = _FERTILIZER_OPTIONS[fertilizer_type]
     
-    with get_db_connection() as conn:
+    with write_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
         
         # Get comprehensive crop details
         cursor.execute("""
@@ -1580,7 +1724,7 @@ async def fertilize_crop(
                    total_investment, care_score, last_fertilized, planted_at
             FROM crops 
             WHERE id = ? AND user_id = ?
-        """, (crop_id, current_user["id"]))
+        """, (crop_id, user_id))
         
         crop = cursor.fetchone()
         if not crop:
@@ -1642,38 +1786,29 @@ async def fertilize_crop(
             growth_acceleration = 0.1  # 10% faster growth
         
         # Update crop in database
-        cursor.execute("""
-            UPDATE crops SET 
-                fertilizer_level = ?, health = ?, total_investment = ?,
-                care_score = ?, last_fertilized = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (new_fertilizer_level, new_health, new_investment, new_care_score, crop_id))
+        cursor.execute(_FERTILIZE_CROP_SQL, (new_fertilizer_level, new_health, new_investment, new_care_score, crop_id))
         
         # Update user coins and XP
-        new_coins = current_user["coins"] - fertilizer_config["cost"]
-        new_xp = current_user.get("xp", 0) + total_xp
-        cursor.execute("UPDATE users SET coins = ?, xp = ? WHERE id = ?", 
-                      (new_coins, new_xp, current_user["id"]))
+        cursor.execute(_ADD_TO_WALLET_SQL, (-fertilizer_config["cost"], total_xp, user_id))
         
         # Log the fertilizer application
-        cursor.execute("""
-            INSERT OR REPLACE INTO crop_care_log 
-            (crop_id, user_id, action_type, quality_level, cost_paid, efficiency_score, created_at)
-            VALUES (?, ?, 'fertilize', ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (crop_id, current_user["id"], fertilizer_type, fertilizer_config["cost"], fertilizer_quality_score))
-        
-        conn.commit()
+        cursor.execute(_LOG_CARE_SQL, (
+            crop_id, user_id, "fertilize", fertilizer_type,
+            fertilizer_config["cost"], fertilizer_quality_score
+        ))
         
-        # Log activity and check for challenge completions
-        from .activity_tracker import log_activity
+        # Record the activity; achievements are checked once this commits
         log_activity(
-            user_id=current_user["id"],
+            user_id=user_id,
             action_type="fertilize", 
             xp_earned=total_xp,
             coins_earned=0,
-            db_connection=conn
+            db_connection=conn,
+            check_achievements=False
         )
         
+        conn.commit()
+        
         # Generate expert recommendations
         recommendations = []
         if over_fertilizer_penalty < 1.0:
@@ -1708,123 +1843,149 @@ async def fertilize_crop(
             "status": "success"
         }
 
+
+@app.post("/farm/fertilize/{crop_id}")
+async def fertilize_crop(
+    crop_id: int,
+    background_tasks: BackgroundTasks,
+    fertilizer_type: str = "basic",  # basic (15 coins), organic (25 coins), premium (40 coins)
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Fertilize a crop with realistic costs and advanced plant nutrition science."""
+    if fertilizer_type not in _FERTILIZER_OPTIONS:
+        fertilizer_type = "basic"
+    
+    fertilizer_config = _FERTILIZER_OPTIONS[fertilizer_type]
+    
+    # Check if user has enough coins
+    if current_user.get("coins", 0) < fertilizer_config["cost"]:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Insufficient coins for {fertilizer_config['name']} (need {fertilizer_config['cost']} coins)"
+        )
+    
+    response = await asyncio.to_thread(_fertilize_crop, crop_id, current_user["id"], fertilizer_type)
+    _challenges_cache.pop(current_user["id"], None)
+    background_tasks.add_task(check_achievements_for_user, current_user["id"], None)
+    return response
+
+# The shop never changes at runtime, so it is encoded once and revalidated by ETag
+_CARE_SHOP = {
+    "water_supplies": [
+        {
+            "id": "basic_water",
+            "name": "Tap Water",
+            "cost_per_use": 5,
+            "quality_bonus": 1.0,
+            "description": "Basic watering with tap water",
+            "icon": "🚰"
+        },
+        {
+            "id": "premium_water", 
+            "name": "Filtered Water",
+            "cost_per_use": 12,
+            "quality_bonus": 1.6,
+            "description": "Purified water with optimal pH balance",
+            "icon": "💧"
+        },
+        {
+            "id": "expert_water",
+            "name": "Nutrient-Enhanced Water",
+            "cost_per_use": 20,
+            "quality_bonus": 2.0,
+            "description": "Premium water with trace minerals",
+            "icon": "✨"
+        }
+    ],
+    "fertilizers": [
+        {
+            "id": "basic_fertilizer",
+            "name": "Basic NPK Fertilizer",
+            "cost_per_use": 15,
+            "nutrient_type": "balanced",
+            "effectiveness": 1.0,
+            "duration_days": 7,
+            "description": "Standard 10-10-10 fertilizer blend",
+            "icon": "🌱"
+        },
+        {
+            "id": "organic_fertilizer",
+            "name": "Organic Compost Blend", 
+            "cost_per_use": 25,
+            "nutrient_type": "organic",
+            "effectiveness": 1.5,
+            "duration_days": 12,
+            "description": "Slow-release organic nutrients from compost",
+            "icon": "🍃"
+        },
+        {
+            "id": "premium_fertilizer",
+            "name": "Expert Slow-Release Formula",
+            "cost_per_use": 40,
+            "nutrient_type": "premium",
+            "effectiveness": 2.0,
+            "duration_days": 18,
+            "description": "Professional-grade controlled-release fertilizer",
+            "icon": "🔬"
+        }
+    ],
+    "premium_services": [
+        {
+            "id": "soil_test",
+            "name": "Professional Soil Analysis",
+            "cost": 50,
+            "description": "Get detailed soil composition and pH analysis",
+            "benefits": ["Optimized fertilizer recommendations", "+20% fertilizer effectiveness for 30 days"],
+            "icon": "🧪"
+        },
+        {
+            "id": "expert_consultation",
+            "name": "Agricultural Expert Consultation", 
+            "cost": 75,
+            "description": "Personal consultation with farming expert",
+            "benefits": ["Custom care plan", "+30% all care effectiveness for 14 days"],
+            "icon": "👨‍🌾"
+        }
+    ]
+}
+_CARE_SHOP_JSON = orjson.dumps(_CARE_SHOP)
+_CARE_SHOP_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": f'"{hashlib.sha1(_CARE_SHOP_JSON).hexdigest()[:16]}"',
+}
+
+
 @app.get("/farm/care-shop")
-async def get_plant_care_shop():
+async def get_plant_care_shop(if_none_match: str | None = Header(None)):
     """Get available plant care supplies with prices and quality options."""
-    
-    return {
-        "water_supplies": [
-            {
-                "id": "basic_water",
-                "name": "Tap Water",
-                "cost_per_use": 5,
-                "quality_bonus": 1.0,
-                "description": "Basic watering with tap water",
-                "icon": "🚰"
-            },
-            {
-                "id": "premium_water", 
-                "name": "Filtered Water",
-                "cost_per_use": 12,
-                "quality_bonus": 1.6,
-                "description": "Purified water with optimal pH balance",
-                "icon": "💧"
-            },
-            {
-                "id": "expert_water",
-                "name": "Nutrient-Enhanced Water",
-                "cost_per_use": 20,
-                "quality_bonus": 2.0,
-                "description": "Premium water with trace minerals",
-                "icon": "✨"
-            }
-        ],
-        "fertilizers": [
-            {
-                "id": "basic_fertilizer",
-                "name": "Basic NPK Fertilizer",
-                "cost_per_use": 15,
-                "nutrient_type": "balanced",
-                "effectiveness": 1.0,
-                "duration_days": 7,
-                "description": "Standard 10-10-10 fertilizer blend",
-                "icon": "🌱"
-            },
-            {
-                "id": "organic_fertilizer",
-                "name": "Organic Compost Blend", 
-                "cost_per_use": 25,
-                "nutrient_type": "organic",
-                "effectiveness": 1.5,
-                "duration_days": 12,
-                "description": "Slow-release organic nutrients from compost",
-                "icon": "🍃"
-            },
-            {
-                "id": "premium_fertilizer",
-                "name": "Expert Slow-Release Formula",
-                "cost_per_use": 40,
-                "nutrient_type": "premium",
-                "effectiveness": 2.0,
-                "duration_days": 18,
-                "description": "Professional-grade controlled-release fertilizer",
-                "icon": "🔬"
-            }
-        ],
-        "premium_services": [
-            {
-                "id": "soil_test",
-                "name": "Professional Soil Analysis",
-                "cost": 50,
-                "description": "Get detailed soil composition and pH analysis",
-                "benefits": ["Optimized fertilizer recommendations", "+20% fertilizer effectiveness for 30 days"],
-                "icon": "🧪"
-            },
-            {
-                "id": "expert_consultation",
-                "name": "Agricultural Expert Consultation", 
-                "cost": 75,
-                "description": "Personal consultation with farming expert",
-                "benefits": ["Custom care plan", "+30% all care effectiveness for 14 days"],
-                "icon": "👨‍🌾"
-            }
-        ]
-    }
+    if if_none_match == _CARE_SHOP_HEADERS["ETag"]:
+        return Response(status_code=304, headers=_CARE_SHOP_HEADERS)
+    return Response(_CARE_SHOP_JSON, media_type="application/json", headers=_CARE_SHOP_HEADERS)
+
+# Every scorecard carries the same tips, encoded once; the scorecard is returned
+# as an ORJSONResponse so the Fragment is spliced in as-is
+_SCORECARD_RECOMMENDATIONS = orjson.Fragment(orjson.dumps([
+    "🎯 Maintain consistent care for best results",
+    "💡 Higher quality supplies improve efficiency",
+    "📊 Track your ROI to optimize investments"
+]))
 
 @app.get("/farm/plant-scorecard/{crop_id}")
 async def get_plant_scorecard(
     crop_id: int,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(get_current_auth_user)
 ):
     """Get comprehensive plant performance scorecard."""
-    from .database import get_db_connection
-    
-    with get_db_connection() as conn:
+    with db_pool.acquire() as conn:
         cursor = conn.cursor()
         
-        # Get crop details
-        cursor.execute("""
-            SELECT id, name, water_level, health, fertilizer_level, growth_stage,
-                   total_investment, care_score, planted_at, last_watered, last_fertilized
-            FROM crops 
-            WHERE id = ? AND user_id = ?
-        """, (crop_id, current_user["id"]))
+        # Get crop details and its care action count
+        cursor.execute(_SCORECARD_CROP_SQL, (crop_id, current_user["id"]))
         
         crop = cursor.fetchone()
         if not crop:
             raise HTTPException(status_code=404, detail="Crop not found")
         
-        # Get care history
-        cursor.execute("""
-            SELECT action_type, quality_level, cost_paid, efficiency_score, created_at
-            FROM crop_care_log 
-            WHERE crop_id = ? AND user_id = ?
-            ORDER BY created_at DESC
-            LIMIT 20
-        """, (crop_id, current_user["id"]))
-        
-        care_history = cursor.fetchall()
-        
         # Calculate comprehensive scores
         water_level = crop[2] or 50
         health = crop[3] or 50
@@ -1832,12 +1993,13 @@ async def get_plant_scorecard(
         growth_stage = crop[5] or 1
         total_investment = crop[6] or 0
         care_score = crop[7] or 60.0
+        care_actions = crop[11]
         
         # Calculate category scores
         water_score = min(100, water_level + (20 if water_level > 70 else 0))
         nutrition_score = min(100, fertilizer_level + (15 if fertilizer_level > 60 else 0))
         health_score = health
-        consistency_score = len(care_history) * 5  # 5 points per care action
+        consistency_score = care_actions * 5  # 5 points per care action
         
         overall_score = (water_score + nutrition_score + health_score + consistency_score) / 4
         
@@ -1866,14 +2028,14 @@ async def get_plant_scorecard(
         achievements = []
         if total_investment >= 100:
             achievements.append("💰 Serious Investor")
-        if len(care_history) >= 10:
+        if care_actions >= 10:
             achievements.append("🤲 Dedicated Caretaker")
         if overall_score >= 85:
             achievements.append("🏆 Plant Care Expert")
         if roi_percentage > 50:
             achievements.append("📈 Profit Maker")
         
-        return {
+        return ORJSONResponse({
             "plant_id": crop_id,
             "plant_name": crop[1],
             "overall_score": round(overall_score, 1),
@@ -1889,35 +2051,27 @@ async def get_plant_scorecard(
             "efficiency_rating": efficiency_rating,
             "bonus_multiplier": bonus_multiplier,
             "achievements": achievements,
-            "care_actions_count": len(care_history),
+            "care_actions_count": care_actions,
             "growth_stage": growth_stage,
             "days_since_planted": (datetime.now() - datetime.fromisoformat(crop[8].replace('Z', '+00:00'))).days if crop[8] else 0,
-            "recommendations": [
-                "🎯 Maintain consistent care for best results",
-                "💡 Higher quality supplies improve efficiency",
-                "📊 Track your ROI to optimize investments"
-            ]
-        }
+            "recommendations": _SCORECARD_RECOMMENDATIONS,
+        })
 
-@app.post("/farm/calculate-care-rewards/{crop_id}")
-async def calculate_care_rewards(
-    crop_id: int,
-    current_user: Dict[str, Any] = Depends(get_current_user)
-):
-    """Calculate and award bonus rewards based on plant care performance."""
-    from .database import get_db_connection
-    
-    with get_db_connection() as conn:
+
+def _claim_care_reward(crop_id: int, user_id: int) -> Dict[str, Any]:
+    """Claim a crop's care reward in one writer transaction; run via asyncio.to_thread."""
+    with write_connection() as conn:
         cursor = conn.cursor()
-        
-        # Get crop performance data
-        cursor.execute("""
-            SELECT care_score, total_investment, growth_stage, health, planted_at
-            FROM crops 
-            WHERE id = ? AND user_id = ?
-        """, (crop_id, current_user["id"]))
-        
-        crop = cursor.fetchone()
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Mark this reward as claimed and get crop performance data
+        params = (crop_id, user_id)
+        if HAS_RETURNING:
+            crop = cursor.execute(_MARK_CARE_REWARD_RETURNING_SQL, params).fetchone()
+        elif cursor.execute(_MARK_CARE_REWARD_SQL, params).rowcount:
+            crop = cursor.execute(f"SELECT {_CARE_REWARD_COLS} FROM crops WHERE id = ?", (crop_id,)).fetchone()
+        else:
+            crop = None
         if not crop:
             raise HTTPException(status_code=404, detail="Crop not found")
         
@@ -1930,21 +2084,11 @@ async def calculate_care_rewards(
         base_reward = 10
         
         # Performance bonuses
-        if care_score >= 95:
-            performance_bonus = 50
-            performance_tier = "Legendary Farmer"
-        elif care_score >= 85:
-            performance_bonus = 30
-            performance_tier = "Master Grower"
-        elif care_score >= 75:
-            performance_bonus = 20
-            performance_tier = "Expert Caretaker"
-        elif care_score >= 65:
-            performance_bonus = 10
-            performance_tier = "Good Farmer"
+        for threshold, _, performance_tier, performance_bonus in _FARMER_TIERS:
+            if care_score >= threshold:
+                break
         else:
-            performance_bonus = 5
-            performance_tier = "Learning Farmer"
+            _, performance_tier, performance_bonus = _DEFAULT_FARMER_TIER
         
         # Investment efficiency bonus (good ROI)
         investment_efficiency = care_score / max(total_investment, 1)
@@ -1971,17 +2115,7 @@ async def calculate_care_rewards(
             coins_bonus = int(care_score - 70)  # Escalating coin rewards
         
         # Update user rewards
-        new_xp = current_user.get("xp", 0) + total_xp_reward
-        new_coins = current_user.get("coins", 0) + coins_bonus
-        
-        cursor.execute("UPDATE users SET xp = ?, coins = ? WHERE id = ?", 
-                      (new_xp, new_coins, current_user["id"]))
-        
-        # Mark this reward as claimed (add timestamp)
-        cursor.execute("""
-            UPDATE crops SET last_reward_calculated = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (crop_id,))
+        cursor.execute(_ADD_TO_WALLET_SQL, (coins_bonus, total_xp_reward, user_id))
         
         conn.commit()
         
@@ -2008,28 +2142,31 @@ async def calculate_care_rewards(
             ]
         }
 
+
+@app.post("/farm/calculate-care-rewards/{crop_id}")
+async def calculate_care_rewards(
+    crop_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Calculate and award bonus rewards based on plant care performance."""
+    return await asyncio.to_thread(_claim_care_reward, crop_id, current_user["id"])
+
+# The care leaderboard is the same for every caller; it may lag by at most the TTL
+_care_leaderboard_cache: TTLCache = TTLCache(maxsize=1, ttl=30)
+
+
 @app.get("/leaderboard/care-masters")
 async def get_care_leaderboard():
     """Get leaderboard of best plant care farmers."""
-    from .database import get_db_connection
+    cached = _care_leaderboard_cache.get("care-masters")
+    if cached is not None:
+        return cached
     
-    with get_db_connection() as conn:
+    with db_pool.acquire() as conn:
         cursor = conn.cursor()
         
         # Get top farmers by care score
-        cursor.execute("""
-            SELECT u.username, u.id, 
-                   AVG(c.care_score) as avg_care_score,
-                   COUNT(c.id) as total_crops,
-                   SUM(c.total_investment) as total_invested,
-                   MAX(c.care_score) as best_score
-            FROM users u
-            JOIN crops c ON u.id = c.user_id
-            GROUP BY u.id
-            HAVING total_crops >= 1
-            ORDER BY avg_care_score DESC, best_score DESC
-            LIMIT 20
-        """)
+        cursor.execute(_CARE_LEADERBOARD_SQL)
         
         leaderboard = []
         for i, row in enumerate(cursor.fetchall()):
@@ -2040,27 +2177,15 @@ async def get_care_leaderboard():
                 "total_crops": row[3],
                 "total_investment": row[4],
                 "best_score": round(row[5], 1),
-                "tier": get_farmer_tier(row[2])
+                "tier": row[6]
             })
         
-        return {
+        response = _care_leaderboard_cache["care-masters"] = {
             "leaderboard": leaderboard,
             "total_farmers": len(leaderboard),
             "criteria": "Average Plant Care Score"
         }
-
-def get_farmer_tier(care_score):
-    """Determine farmer tier based on care score."""
-    if care_score >= 95:
-        return "🏆 Legendary Farmer"
-    elif care_score >= 85:
-        return "🌟 Master Grower" 
-    elif care_score >= 75:
-        return "🎯 Expert Caretaker"
-    elif care_score >= 65:
-        return "🌱 Good Farmer"
-    else:
-        return "📚 Learning Farmer"
+        return response
 
 @app.get("/nasa/facts")
 async def get_nasa_facts():
@@ -2101,7 +2226,7 @@ async def get_nasa_facts():
 @app.post("/scenarios/generate/{crop_id}")
 async def generate_scenarios_for_crop(
     crop_id: int,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Generate AI-powered scenarios for a specific crop using NASA data."""
     user_id = current_user["id"]
@@ -2125,7 +2250,7 @@ async def generate_scenarios_for_crop(
         nasa_data = None
         if crop['latitude'] and crop['longitude']:
             try:
-                nasa_client = NASAClient()
+                nasa_client = await get_nasa_client()
                 # Get recent NASA data
                 end_date = datetime.now()
                 start_date = end_date.replace(day=max(1, end_date.day - 7))
@@ -2152,7 +2277,9 @@ async def generate_scenarios_for_crop(
         # Save scenarios to database
         saved_scenarios = []
         for scenario_data in scenarios:
-            scenario_id = ScenarioGenerator.save_scenario_to_db(user_id, crop_id, scenario_data)
+            scenario_id = await asyncio.to_thread(
+                ScenarioGenerator.save_scenario_to_db, user_id, crop_id, scenario_data
+            )
             saved_scenarios.append({
                 "id": scenario_id,
                 **scenario_data
@@ -2173,7 +2300,7 @@ async def generate_scenarios_for_crop(
 @app.get("/scenarios/active")
 async def get_active_scenarios(
     crop_id: int = Query(None, description="Filter by crop ID"),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Get all active scenarios for the user."""
     user_id = current_user["id"]
@@ -2205,7 +2332,7 @@ async def get_active_scenarios(
 async def complete_scenario(
     scenario_id: str,
     request: CompleteScenarioRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Complete a scenario with chosen action."""
     user_id = current_user["id"]
@@ -2219,7 +2346,7 @@ async def complete_scenario(
 
 
 @app.get("/progress", response_model=PlayerProgress)
-async def get_player_progress(current_user: dict = Depends(get_current_user)):
+async def get_player_progress(current_user: dict = Depends(get_current_auth_user)):
     """Get player's current progress and stats."""
     user_id = current_user["id"]
     
@@ -2279,22 +2406,17 @@ async def get_shop_items(
 ):
     """Get available shop items."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         if category:
-            cursor.execute("SELECT * FROM shop_items WHERE available = 1 AND category = ? ORDER BY cost_coins", (category,))
+            rows = query_catalog("SELECT * FROM shop_items WHERE available = 1 AND category = ? ORDER BY cost_coins", (category,))
         else:
-            cursor.execute("SELECT * FROM shop_items WHERE available = 1 ORDER BY category, cost_coins")
+            rows = query_catalog("SELECT * FROM shop_items WHERE available = 1 ORDER BY category, cost_coins")
         
         items = []
-        for row in cursor.fetchall():
+        for row in rows:
             item = dict(row)
             item['effects'] = json.loads(item['effects'] or '{}')
             items.append(item)
         
-        conn.close()
-        
         return {"items": items}
     
     except Exception as e:
@@ -2304,7 +2426,7 @@ async def get_shop_items(
 @app.post("/shop/purchase")
 async def purchase_item(
     request: PurchaseRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Purchase an item from the shop."""
     user_id = current_user["id"]
@@ -2314,13 +2436,12 @@ async def purchase_item(
         cursor = conn.cursor()
         
         # Get item details
-        cursor.execute("SELECT * FROM shop_items WHERE id = ? AND available = 1", (request.item_id,))
-        item_row = cursor.fetchone()
+        item_rows = query_catalog("SELECT * FROM shop_items WHERE id = ? AND available = 1", (request.item_id,))
         
-        if not item_row:
+        if not item_rows:
             raise HTTPException(status_code=404, detail="Item not found")
         
-        item = dict(item_row)
+        item = dict(item_rows[0])
         total_cost = item['cost_coins'] * request.quantity
         
         # Check user's coins from users table
@@ -2392,7 +2513,7 @@ async def get_leaderboard(limit: int = Query(10, le=50)):
 async def simulate_time_passage(
     crop_id: int,
     hours: int = 6,  # Default 6 hours
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(get_current_auth_user)
 ):
     """Simulate time passage for testing plant degradation (hours forward)."""
     from .database import get_db_connection
@@ -2453,7 +2574,7 @@ async def simulate_time_passage(
 @app.post("/educational/generate")
 async def generate_educational_content(
     force_regenerate: bool = False,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Generate personalized educational content with smart caching and auto-updates."""
     from .database import get_db_connection
@@ -2523,7 +2644,9 @@ async def generate_educational_content(
         # Get completed content for UI state
         completed_content = educational_manager.get_completed_content(current_user["id"])
         
-        return {
+        # Rendered directly so cached content blobs (orjson fragments) skip
+        # FastAPI's jsonable_encoder pass
+        return ORJSONResponse({
             "success": True,
             "content": educational_content,
             "location": {"latitude": latitude, "longitude": longitude},
@@ -2532,7 +2655,7 @@ async def generate_educational_content(
             "content_hash": educational_content.get("content_hash", ""),
             "completed_content": completed_content,
             "last_updated": educational_content.get("generated_at", "")
-        }
+        })
         
     except Exception as e:
         logger.error(f"Educational content generation failed: {e}")
@@ -2562,18 +2685,24 @@ async def generate_educational_content(
         }
 
 
+def _credit_content_coins(user_id: int, coins: int) -> None:
+    """Credit coins for completed content on the writer connection; run via asyncio.to_thread."""
+    with write_connection() as conn, conn:
+        conn.execute("UPDATE users SET coins = coins + ? WHERE id = ?", (coins, user_id))
+
+
 @app.post("/educational/complete")
 async def mark_educational_content_completed(
     content_type: str,
     content_id: str, 
     xp_earned: int = 0,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_auth_user)
 ):
     """Mark educational content as completed by user."""
     from .educational_manager import educational_manager
     
     try:
-        success = educational_manager.mark_content_completed(
+        success = await educational_manager.mark_content_completed(
             user_id=current_user["id"],
             content_type=content_type,
             content_id=content_id,
@@ -2582,16 +2711,7 @@ async def mark_educational_content_completed(
         
         if success:
             # Also update user's XP in the main table
-            from .database import get_db_connection
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE users SET coins = coins + ? WHERE id = ?
-            """, (xp_earned, current_user["id"]))
-            
-            conn.commit()
-            conn.close()
+            await asyncio.to_thread(_credit_content_coins, current_user["id"], xp_earned)
             
             return {
                 "success": True,
@@ -2613,7 +2733,7 @@ async def mark_educational_content_completed(
 
 
 @app.post("/educational/check-updates")
-async def check_educational_content_updates(current_user: dict = Depends(get_current_user)):
+async def check_educational_content_updates(current_user: dict = Depends(get_current_auth_user)):
     """Check if educational content needs updating due to farm changes."""
     from .educational_manager import educational_manager
     
@@ -2637,7 +2757,7 @@ async def check_educational_content_updates(current_user: dict = Depends(get_cur
 
 
 @app.get("/analytics/farm")
-async def get_farm_analytics(current_user: dict = Depends(get_current_user)):
+async def get_farm_analytics(current_user: dict = Depends(get_current_auth_user)):
     """Get comprehensive farm analytics for the current user."""
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -2790,10 +2910,9 @@ async def get_farm_analytics(current_user: dict = Depends(get_current_user)):
         
         if farm_location:
             try:
-                from .nasa_client import NASAClient
                 from datetime import datetime, timedelta
                 
-                nasa_client = NASAClient()
+                nasa_client = await get_nasa_client()
                 end_date = datetime.now()
                 start_date = end_date - timedelta(days=7)
                 
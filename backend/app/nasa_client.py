@@ -15,7 +15,11 @@ class NASAClientError(RuntimeError):
 class NASAClient:
     def __init__(self, client: httpx.AsyncClient | None = None) -> None:
         self._settings = get_settings()
-        self._client = client or httpx.AsyncClient(timeout=httpx.Timeout(30.0), trust_env=False)
+        self._client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            trust_env=False,
+        )
 
     async def fetch_daily_power_data(
         self, *, lat: float, lon: float, start: str, end: str
@@ -57,9 +61,8 @@ class NASAClient:
             raise NASAClientError("Unexpected response from NASA POWER API") from exc
         return parameter_data
 
-    def get_farm_data(self, latitude: float, longitude: float) -> Dict | None:
-        """Get farm data for a location (synchronous wrapper for compatibility)."""
-        import asyncio
+    async def get_recent_farm_data(self, latitude: float, longitude: float) -> Dict | None:
+        """Get the last week of data for a location, or None if the fetch fails."""
         from datetime import datetime, timedelta
         
         try:
@@ -67,25 +70,35 @@ class NASAClient:
             end_date = (datetime.now() - timedelta(days=3)).strftime("%Y%m%d")
             start_date = (datetime.now() - timedelta(days=10)).strftime("%Y%m%d")
             
+            parameter_data = await self.fetch_daily_power_data(
+                lat=latitude, 
+                lon=longitude, 
+                start=start_date, 
+                end=end_date
+            )
+            
+            # Convert to expected format
+            return {
+                "properties": {
+                    "parameter": parameter_data
+                }
+            }
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.error(f"Error fetching farm data: {e}")
+            return None
+
+    def get_farm_data(self, latitude: float, longitude: float) -> Dict | None:
+        """Get farm data for a location (synchronous wrapper for compatibility)."""
+        import asyncio
+        
+        try:
             # Run the async method
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                parameter_data = loop.run_until_complete(
-                    self.fetch_daily_power_data(
-                        lat=latitude, 
-                        lon=longitude, 
-                        start=start_date, 
-                        end=end_date
-                    )
-                )
-                
-                # Convert to expected format
-                return {
-                    "properties": {
-                        "parameter": parameter_data
-                    }
-                }
+                return loop.run_until_complete(self.get_recent_farm_data(latitude, longitude))
             finally:
                 loop.close()
                 
@@ -102,23 +115,20 @@ class NASAClient:
 def to_daily_series(parameter_data: Dict[str, Dict[str, float]]) -> List[Dict[str, float]]:
     """Transforms parameter keyed dict into list of daily readings."""
 
-    # gather all unique dates from available parameters
-    unique_dates: set[dt.date] = set()
-    for series in parameter_data.values():
-        for date_str in series.keys():
-            unique_dates.add(_parse_date(date_str))
-
-    sorted_dates = sorted(unique_dates)
-    daily_records: List[Dict[str, float]] = []
-    for date in sorted_dates:
-        entry: Dict[str, float] = {"date": date.isoformat()}
-        for parameter, readings in parameter_data.items():
-            value = readings.get(date.strftime("%Y%m%d"))
+    # group readings by their YYYYMMDD key in a single pass
+    readings_by_date: Dict[str, Dict[str, float]] = {}
+    for parameter, readings in parameter_data.items():
+        key = parameter.lower()
+        for date_str, value in readings.items():
+            entry = readings_by_date.setdefault(date_str, {})
             if value is not None:
-                entry[parameter.lower()] = float(value)
-        daily_records.append(entry)
+                entry[key] = float(value)
 
-    return daily_records
+    # YYYYMMDD keys sort chronologically, so each date is parsed only once
+    return [
+        {"date": _parse_date(date_str).isoformat(), **values}
+        for date_str, values in sorted(readings_by_date.items())
+    ]
 
 
 def _parse_date(date_str: str) -> dt.date:
@@ -6,14 +6,22 @@ import json
 import random
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
-from .database import get_db_connection
+from .database import db_pool, get_db_connection, write_connection
 from .ai_scenarios import AIScenarioGenerator
 
 logger = logging.getLogger(__name__)
 
+_INSERT_SCENARIO_SQL = """
+    INSERT INTO plant_scenarios (
+        id, crop_id, user_id, scenario_type, severity, description,
+        impact_description, nasa_data_trigger, available_actions,
+        auto_resolve_time, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 
 class ScenarioGenerator:
     """Generate intelligent scenarios based on NASA data and crop conditions."""
@@ -355,13 +363,8 @@ class ScenarioGenerator:
         }
     
     @staticmethod
-    def save_scenario_to_db(user_id: int, crop_id: int, scenario_data: Dict) -> str:
-        """Save a generated scenario to the database."""
-        scenario_id = str(uuid.uuid4())
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
+    def _scenario_row(user_id: int, crop_id: int, scenario_data: Dict) -> tuple:
+        """Build the plant_scenarios row for a generated scenario, with a fresh id first."""
         # Handle AI-generated scenarios that may have 'title' instead of just description
         description = scenario_data.get('description', '')
         if scenario_data.get('title') and scenario_data['title'] not in description:
@@ -376,14 +379,8 @@ class ScenarioGenerator:
         if not nasa_trigger and scenario_data.get('scientific_basis'):
             nasa_trigger = {'ai_generated': True, 'basis': scenario_data['scientific_basis']}
         
-        cursor.execute("""
-            INSERT INTO plant_scenarios (
-                id, crop_id, user_id, scenario_type, severity, description,
-                impact_description, nasa_data_trigger, available_actions,
-                auto_resolve_time, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            scenario_id,
+        return (
+            str(uuid.uuid4()),
             crop_id,
             user_id,
             scenario_data['scenario_type'],
@@ -394,42 +391,57 @@ class ScenarioGenerator:
             json.dumps(scenario_data.get('available_actions', [])),
             scenario_data.get('auto_resolve_time'),
             datetime.now().isoformat()
-        ))
+        )
+    
+    @staticmethod
+    def save_scenario_to_db(user_id: int, crop_id: int, scenario_data: Dict) -> str:
+        """Save a generated scenario to the database."""
+        return ScenarioGenerator.save_scenarios_to_db(user_id, [(crop_id, scenario_data)])[0]
+    
+    @staticmethod
+    def save_scenarios_to_db(user_id: int, scenarios: List[Tuple[int, Dict]]) -> List[str]:
+        """Save (crop_id, scenario_data) pairs in one transaction and return their ids."""
+        rows = [ScenarioGenerator._scenario_row(user_id, crop_id, data) for crop_id, data in scenarios]
         
-        conn.commit()
-        conn.close()
+        with write_connection() as conn, conn:
+            conn.executemany(_INSERT_SCENARIO_SQL, rows)
         
-        return scenario_id
+        return [row[0] for row in rows]
     
     @staticmethod
     def get_active_scenarios(user_id: int, crop_id: Optional[int] = None) -> List[Dict]:
         """Get all active scenarios for a user or specific crop."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if crop_id:
-            cursor.execute("""
-                SELECT * FROM plant_scenarios 
-                WHERE user_id = ? AND crop_id = ? AND active = 1
-                ORDER BY created_at DESC
-            """, (user_id, crop_id))
-        else:
-            cursor.execute("""
-                SELECT * FROM plant_scenarios 
-                WHERE user_id = ? AND active = 1
-                ORDER BY created_at DESC
-            """, (user_id,))
+        with db_pool.acquire() as conn:
+            if crop_id:
+                rows = conn.execute("""
+                    SELECT * FROM plant_scenarios 
+                    WHERE user_id = ? AND crop_id = ? AND active = 1
+                    ORDER BY created_at DESC
+                """, (user_id, crop_id)).fetchall()
+            else:
+                rows = conn.execute("""
+                    SELECT * FROM plant_scenarios 
+                    WHERE user_id = ? AND active = 1
+                    ORDER BY created_at DESC
+                """, (user_id,)).fetchall()
         
         scenarios = []
-        for row in cursor.fetchall():
+        for row in rows:
             scenario = dict(row)
             scenario['nasa_data_trigger'] = json.loads(scenario['nasa_data_trigger'] or '{}')
             scenario['available_actions'] = json.loads(scenario['available_actions'] or '[]')
             scenarios.append(scenario)
         
-        conn.close()
         return scenarios
     
+    @staticmethod
+    def get_active_scenarios_by_crop(user_id: int) -> Dict[int, List[Dict]]:
+        """Get a user's active scenarios grouped by crop id, in one query."""
+        by_crop: Dict[int, List[Dict]] = {}
+        for scenario in ScenarioGenerator.get_active_scenarios(user_id):
+            by_crop.setdefault(scenario['crop_id'], []).append(scenario)
+        return by_crop
+    
     @staticmethod
     def complete_scenario(scenario_id: str, action_id: str, user_id: int) -> Dict:
         """Complete a scenario with chosen action and award rewards."""